@@ -1,9 +1,25 @@
 import os
+import copy
+
+# Format of the audio sent to the agent. The microphone is captured at
+# main.RATE and resampled/encoded to this on the client.
+INPUT_AUDIO = {"encoding": "linear16", "sample_rate": 16000}
+
+# Client-side voice activity gating of the microphone (see
+# audio_processing.VoiceActivityGate). While gated, KeepAlive messages are
+# sent every KEEPALIVE_INTERVAL seconds to hold the connection open.
+VAD_SETTINGS = {
+    "enabled": True,
+    "threshold_db": -45.0,
+    "pre_roll_ms": 300,
+    "hangover_ms": 1000,
+}
+KEEPALIVE_INTERVAL = 5.0
 
 AGENT_SETTINGS = {
     "type": "Settings",
     "audio": {
-        "input": {"encoding": "linear16", "sample_rate": 44100},
+        "input": dict(INPUT_AUDIO),
         "output": {
             "encoding": "linear16",
             "sample_rate": 16000,
@@ -20,6 +36,7 @@ AGENT_SETTINGS = {
                 "  If asked about delivery address, reply only with the shipping address, etc.\n"
                 "- If the user asks a general or summary question, such as 'Tell me about order {order_id}' or 'Give me details about order {order_id}', "
                 "  provide a clear, concise, human-friendly summary combining key details like status, items, delivery date, vendor, and shipping address.\n"
+                "  Call get_order_summary once for these questions instead of calling the individual order functions.\n"
                 "- Always answer using complete sentences and a natural, conversational tone.\n"
                 "- Do not add extra information beyond what was asked.\n"
                 "- When the user ends the conversation or says goodbye, respond only with: 'Bye and have a nice day.' Do not continue the conversation after that."
@@ -95,6 +112,20 @@ AGENT_SETTINGS = {
                         "required": ["order_id"],
                     },
                 },
+                {
+                    "name": "get_order_summary",
+                    "description": "Get the status, items, delivery date, vendor and shipping address of an order by its ID in one call. Use this for general or summary questions about an order.",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "order_id": {
+                                "type": "string",
+                                "description": "The order ID to look up",
+                            }
+                        },
+                        "required": ["order_id"],
+                    },
+                },
                 {
                     "name": "end_story",
                     "description": "End the conversation.",
@@ -110,3 +141,26 @@ AGENT_SETTINGS = {
         ),
     },
 }
+
+
+def build_settings(input_encoding=None, input_sample_rate=None, settings=AGENT_SETTINGS):
+    settings = copy.deepcopy(settings)
+    audio_input = settings["audio"]["input"]
+    if input_encoding:
+        audio_input["encoding"] = input_encoding
+    if input_sample_rate:
+        audio_input["sample_rate"] = input_sample_rate
+    return settings
+
+
+def merge_settings(overrides, settings=AGENT_SETTINGS):
+    # Nested dicts are merged key by key; any other value replaces the base
+    def merge(base, extra):
+        for key, value in extra.items():
+            if isinstance(value, dict) and isinstance(base.get(key), dict):
+                merge(base[key], value)
+            else:
+                base[key] = copy.deepcopy(value)
+        return base
+
+    return merge(copy.deepcopy(settings), overrides or {})
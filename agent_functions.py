@@ -1,48 +1,190 @@
 import json
+import os
+import threading
 
 import csv
 from collections import defaultdict
+from functools import lru_cache
 
-ORDERS = []
-
-# Read order-level data
-orders_map = {}
-with open("./data/orders.csv", newline='') as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        order_id = row["order_id"]
-        orders_map[order_id] = {
-            "order_id": order_id,
-            "store_location": row["store_location"],
-            "vendor_name": row["vendor_name"],
-            "status": row["status"],
-            "order_date": row["order_date"],
-            "delivery_date": row["delivery_date"],
-            "items": [],  # will populate later
-            "shipping_address": {
-                "line1": row["shipping_address_line1"],
-                "line2": row.get("shipping_address_line2", ""),
-                "city": row["shipping_address_city"],
-                "state": row["shipping_address_state"],
-                "zip": row["shipping_address_zip"],
-                "country": row["shipping_address_country"]
+from fuzzy_index import near_matches
+from order_db import OrderDB
+from order_snapshot import OrderSnapshot
+from spoken_numbers import parse_spoken_number
+
+ORDERS_CSV = "./data/orders.csv"
+ORDER_ITEMS_CSV = "./data/order_items.csv"
+ORDER_SNAPSHOT = os.environ.get("ORDER_SNAPSHOT", "./data/orders.snapshot")
+# Set to a database built with order_db.py to serve orders from SQLite
+ORDER_DB = os.environ.get("ORDER_DB")
+
+
+def load_orders(orders_path=ORDERS_CSV, items_path=ORDER_ITEMS_CSV):
+    # Read order-level data
+    orders_map = {}
+    with open(orders_path, newline='') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            order_id = row["order_id"]
+            orders_map[order_id] = {
+                "order_id": order_id,
+                "store_location": row["store_location"],
+                "vendor_name": row["vendor_name"],
+                "status": row["status"],
+                "order_date": row["order_date"],
+                "delivery_date": row["delivery_date"],
+                "items": [],  # will populate later
+                "shipping_address": {
+                    "line1": row["shipping_address_line1"],
+                    "line2": row.get("shipping_address_line2", ""),
+                    "city": row["shipping_address_city"],
+                    "state": row["shipping_address_state"],
+                    "zip": row["shipping_address_zip"],
+                    "country": row["shipping_address_country"]
+                }
             }
-        }
 
-# Read item-level data and append to appropriate order
-with open("./data/order_items.csv", newline='') as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        item = {
-            "product_id": row["product_id"],
-            "product_name": row["product_name"],
-            "quantity": int(row["quantity"]),
-            "unit_price": float(row["unit_price"])
+    # Read item-level data and append to appropriate order
+    with open(items_path, newline='') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            item = {
+                "product_id": row["product_id"],
+                "product_name": row["product_name"],
+                "quantity": int(row["quantity"]),
+                "unit_price": float(row["unit_price"])
+            }
+            orders_map[row["order_id"]]["items"].append(item)
+
+    # Convert to list
+    return list(orders_map.values())
+
+
+class OrderStore:
+    # Secondary indexes built alongside the primary order_id index
+    INDEXED_FIELDS = ("vendor_name", "status", "store_location")
+
+    def __init__(self, orders, version=0):
+        self.version = version
+        self._by_id = {}
+        self._indexes = {field: defaultdict(list) for field in self.INDEXED_FIELDS}
+        for order in orders:
+            self._by_id[order["order_id"].lower()] = order
+            for field, index in self._indexes.items():
+                index[order[field].lower()].append(order)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def get(self, order_id):
+        return self._by_id.get(order_id.lower())
+
+    def find(self, field, value):
+        if field not in self._indexes:
+            raise KeyError(f"Field {field!r} is not indexed")
+        return list(self._indexes[field].get(value.lower(), ()))
+
+    def find_by_vendor(self, vendor_name):
+        return self.find("vendor_name", vendor_name)
+
+    def find_by_status(self, status):
+        return self.find("status", status)
+
+    def find_by_location(self, store_location):
+        return self.find("store_location", store_location)
+
+    def ids(self):
+        return (order["order_id"] for order in self._by_id.values())
+
+    def _stored_id(self, order_id):
+        order = self._by_id.get(order_id.lower())
+        return order["order_id"] if order is not None else None
+
+    def lookup(self, query, limit=3):
+        # Each near miss of the query is one dict lookup
+        return near_matches(query, self._stored_id, limit)
+
+    def apply(self, upserts=(), removed=()):
+        # Copy-on-write: returns a new store sharing every untouched order and
+        # index bucket with this one, so readers holding the old store are
+        # never exposed to a partially applied change.
+        store = OrderStore((), self.version + 1)
+        store._by_id = dict(self._by_id)
+        store._indexes = {
+            field: defaultdict(list, index) for field, index in self._indexes.items()
         }
-        orders_map[row["order_id"]]["items"].append(item)
 
-# Convert to list
-ORDERS = list(orders_map.values())
+        stale = set()
+        touched = set()
+        for order_id in [*removed, *(order["order_id"] for order in upserts)]:
+            old = store._by_id.pop(order_id.lower(), None)
+            if old is not None:
+                stale.add(id(old))
+                touched.update((field, old[field].lower()) for field in self.INDEXED_FIELDS)
+        for order in upserts:
+            touched.update((field, order[field].lower()) for field in self.INDEXED_FIELDS)
+
+        for field, key in touched:
+            index = store._indexes[field]
+            bucket = [order for order in index.get(key, ()) if id(order) not in stale]
+            if bucket:
+                index[key] = bucket
+            else:
+                index.pop(key, None)
+        for order in upserts:
+            store._by_id[order["order_id"].lower()] = order
+            for field, index in store._indexes.items():
+                index[order[field].lower()].append(order)
+        return store
+
+
+def _snapshot_is_fresh():
+    # The compiled snapshot (see order_snapshot.py) is only trusted if the
+    # CSVs have not been edited since it was built.
+    if not os.path.exists(ORDER_SNAPSHOT):
+        return False
+    snapshot_mtime = os.path.getmtime(ORDER_SNAPSHOT)
+    return all(os.path.getmtime(p) <= snapshot_mtime for p in (ORDERS_CSV, ORDER_ITEMS_CSV))
+
+
+def load_store():
+    if ORDER_DB:
+        return OrderDB(ORDER_DB)
+    if _snapshot_is_fresh():
+        return OrderSnapshot(ORDER_SNAPSHOT)
+    return OrderStore(load_orders(ORDERS_CSV, ORDER_ITEMS_CSV))
+
+
+STORE = load_store()
+_reload_lock = threading.Lock()
+
+
+def reload_store():
+    # Rebuilds the store from disk and swaps it in with a single assignment.
+    # Lookups read STORE once per call, so in-flight calls finish against the
+    # version they started with.
+    global STORE
+    with _reload_lock:
+        current = STORE
+        if isinstance(current, OrderStore) and not _snapshot_is_fresh():
+            orders = {
+                order["order_id"].lower(): order
+                for order in load_orders(ORDERS_CSV, ORDER_ITEMS_CSV)
+            }
+            upserts = [
+                order for key, order in orders.items() if current.get(key) != order
+            ]
+            removed = [order_id for order_id in current.ids() if order_id.lower() not in orders]
+            if upserts or removed:
+                STORE = current.apply(upserts, removed)
+        else:
+            store = load_store()
+            store.version = current.version + 1
+            STORE = store
+        return STORE
+
+
+def data_version():
+    return STORE.version
 
 
 ORDER_ID_MAP = {
@@ -59,59 +201,109 @@ ORDER_ID_MAP = {
 
 
 
+@lru_cache(maxsize=4096)
 def normalize_order_id(order_id: str) -> str:
-    order_id_lower = order_id.lower()
+    order_id_lower = order_id.lower().strip()
     if order_id_lower in ORDER_ID_MAP:
         return ORDER_ID_MAP[order_id_lower]
-    # fallback: remove spaces and check if numeric
-    stripped = order_id_lower.replace(" ", "")
-    if stripped.isdigit():
-        return stripped
+    # fallback: parse digits, digit words, "double two", "fifty one", etc.
+    digits = parse_spoken_number(order_id_lower)
+    if digits:
+        return digits
     return order_id
 
 
-def get_order_status(order_id: str) -> str:
+def closest_order_ids(order_id: str):
+    return STORE.lookup(normalize_order_id(order_id))
+
+
+def find_order(order_id: str):
+    store = STORE
     order_id_normalized = normalize_order_id(order_id)
-    for order in ORDERS:
-        if order["order_id"].lower() == order_id_normalized.lower():
-            return f"Order {order['order_id']} from vendor {order['vendor_name']} is currently {order['status']}."
+    order = store.get(order_id_normalized)
+    if order is None:
+        # Tolerate a single misheard digit when it points at exactly one order
+        matches = store.lookup(order_id_normalized)
+        if len(matches) == 1:
+            order = store.get(matches[0])
+    return order
+
+
+def order_not_found(order_id: str) -> str:
+    matches = closest_order_ids(order_id)
+    if matches:
+        options = " or ".join(f"order {match}" for match in matches)
+        return f"Sorry, I could not find any order with ID {order_id}. Did you mean {options}?"
     return f"Sorry, I could not find any order with ID {order_id}."
 
 
+def get_order_status(order_id: str) -> str:
+    order = find_order(order_id)
+    if order:
+        return f"Order {order['order_id']} from vendor {order['vendor_name']} is currently {order['status']}."
+    return order_not_found(order_id)
+
+
+def format_items(order) -> str:
+    items_list = []
+    for item in order["items"]:
+        qty = item.get("quantity", 1)
+        name = item.get("product_name", "Unknown item")
+        items_list.append(f"{qty} order of {name}")
+    return ", ".join(items_list)
+
+
+def format_address(addr) -> str:
+    parts = [
+        addr.get("line1", ""),
+        addr.get("line2", ""),
+        f"{addr.get('city', '')}, {addr.get('state', '')} {addr.get('zip', '')}",
+        addr.get("country", ""),
+    ]
+    # Remove empty parts and join with commas
+    return ", ".join(filter(None, parts))
+
+
 def get_order_items(order_id: str) -> str:
-    order_id_normalized = normalize_order_id(order_id)
-    for order in ORDERS:
-        if order["order_id"].lower() == order_id_normalized.lower():
-            if not order.get("items"):
-                return f"Order {order['order_id']} has no items listed."
-            items_list = []
-            for item in order["items"]:
-                qty = item.get("quantity", 1)
-                name = item.get("product_name", "Unknown item")
-                items_list.append(f"{qty} order of {name}")
-            items_str = ", ".join(items_list)
-            return f"Order {order['order_id']} contains: {items_str}."
-    return f"Sorry, I could not find any order with ID {order_id}."
+    order = find_order(order_id)
+    if order:
+        if not order.get("items"):
+            return f"Order {order['order_id']} has no items listed."
+        items_str = format_items(order)
+        return f"Order {order['order_id']} contains: {items_str}."
+    return order_not_found(order_id)
 
 
 def get_delivery_address(order_id: str) -> str:
-    order_id_normalized = normalize_order_id(order_id)
-    for order in ORDERS:
-        if order["order_id"].lower() == order_id_normalized.lower():
-            addr = order.get("shipping_address")
-            if addr:
-                parts = [
-                    addr.get("line1", ""),
-                    addr.get("line2", ""),
-                    f"{addr.get('city', '')}, {addr.get('state', '')} {addr.get('zip', '')}",
-                    addr.get("country", ""),
-                ]
-                # Remove empty parts and join with commas
-                address_str = ", ".join(filter(None, parts))
-                return f"The delivery address for order {order['order_id']} is: {address_str}."
-            else:
-                return f"No delivery address found for order {order['order_id']}."
-    return f"Sorry, I could not find any order with ID {order_id}."
+    order = find_order(order_id)
+    if order:
+        addr = order.get("shipping_address")
+        if addr:
+            address_str = format_address(addr)
+            return f"The delivery address for order {order['order_id']} is: {address_str}."
+        else:
+            return f"No delivery address found for order {order['order_id']}."
+    return order_not_found(order_id)
+
+
+def get_order_summary(order_id: str) -> str:
+    # Everything a "tell me about order X" answer needs, from one lookup, so
+    # the agent does not have to chain the individual getters.
+    order = find_order(order_id)
+    if order:
+        parts = [
+            f"Order {order['order_id']} from vendor {order['vendor_name']} is currently {order['status']}."
+        ]
+        if order.get("items"):
+            parts.append(f"It contains: {format_items(order)}.")
+        else:
+            parts.append("It has no items listed.")
+        parts.append(f"The delivery date is {order['delivery_date']}.")
+        addr = order.get("shipping_address")
+        if addr:
+            parts.append(f"The delivery address is: {format_address(addr)}.")
+        return " ".join(parts)
+    return order_not_found(order_id)
 
 
 def pick_author(author="Charles Dickens") -> str:
@@ -123,21 +315,19 @@ def end_story() -> str:
 
 
 def get_vendor_name(order_id: str) -> str:
-    order_id_normalized = normalize_order_id(order_id)
-    for order in ORDERS:
-        if order["order_id"].lower() == order_id_normalized.lower():
-            return (
-                f"The vendor for order {order['order_id']} is {order['vendor_name']}."
-            )
-    return f"Sorry, I could not find any order with ID {order_id}."
+    order = find_order(order_id)
+    if order:
+        return (
+            f"The vendor for order {order['order_id']} is {order['vendor_name']}."
+        )
+    return order_not_found(order_id)
 
 
 def get_delivery_date(order_id: str) -> str:
-    order_id_normalized = normalize_order_id(order_id)
-    for order in ORDERS:
-        if order["order_id"].lower() == order_id_normalized.lower():
-            return f"The delivery date for order {order['order_id']} is {order['delivery_date']}."
-    return f"Sorry, I could not find any order with ID {order_id}."
+    order = find_order(order_id)
+    if order:
+        return f"The delivery date for order {order['order_id']} is {order['delivery_date']}."
+    return order_not_found(order_id)
 
 
 FUNCTION_MAP = {
@@ -148,6 +338,7 @@ FUNCTION_MAP = {
     "end_story": end_story,
     "get_vendor_name": get_vendor_name,
     "get_delivery_date": get_delivery_date,
+    "get_order_summary": get_order_summary,
 }
 
 if __name__ == "__main__":
@@ -1,91 +1,69 @@
 import streamlit as st
-import threading
-import asyncio
 import logging
-import queue
+from collections import deque
 from streamlit_autorefresh import st_autorefresh
 
-from main import start_stream, open_mic_stream, close_mic_stream
 from agent_config import AGENT_SETTINGS
-from agent_functions import FUNCTION_MAP
-from speaker import Speaker
+from call_runner import CallRunner
+from event_bus import EventBus, EventBusHandler
+from log_pipeline import LogPipeline
+from order_reloader import OrderReloader
+from prompt_cache import PromptCache
 
-log_queue = queue.Queue()
-transcript_queue = queue.Queue()
-
-
-class QueueHandler(logging.Handler):
-    def __init__(self, q):
-        super().__init__()
-        self.q = q
-
-    def emit(self, record):
-        try:
-            msg = self.format(record)
-            self.q.put(msg)
-        except Exception:
-            self.handleError(record)
+logger = logging.getLogger(__name__)
 
+AGENT_URL = "wss://agent.deepgram.com/v1/agent/converse"
 
-root_logger = logging.getLogger()
-root_logger.setLevel(logging.INFO)
+# How much of the call each viewer keeps on screen
+TRANSCRIPT_LINES = 200
+LOG_LINES = 100
 
-existing_console_handler = None
-for handler in root_logger.handlers:
-    if isinstance(handler, logging.StreamHandler):
-        existing_console_handler = handler
-        break
 
-if existing_console_handler is None:
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
+@st.cache_resource
+def log_bus():
+    # Streamlit re-executes this script on every rerun, so logging is set up
+    # once per server process here rather than at import time. Calls log
+    # from the runner's loop thread; the console and bus handlers run on the
+    # pipeline's writer thread instead.
     formatter = logging.Formatter("%(levelname)s:%(name)s:%(message)s")
+    console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
-
-queue_handler = QueueHandler(log_queue)
-queue_handler.setLevel(logging.INFO)
-queue_handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
-root_logger.addHandler(queue_handler)
 
-logger = logging.getLogger(__name__)
+    bus = EventBus(1000)
+    bus_handler = EventBusHandler(bus, logging.INFO)
+    bus_handler.setFormatter(formatter)
+    LogPipeline(logging.INFO, handlers=[console_handler, bus_handler]).start()
+    return bus
 
 
-def voice_agent_runner(shared, transcript_queue):
-    audio, mic_stream = None, None
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+def read_new_events(bus, cursor_key):
+    # Only events published since this viewer's last rerun are copied out
+    events, st.session_state[cursor_key] = bus.read(st.session_state[cursor_key])
+    return events
 
-    async def run_stream():
-        try:
-            await start_stream(
-                mic_stream, "wss://agent.deepgram.com/v1/agent/converse", shared
-            )
-        except asyncio.CancelledError:
-            logger.info("Stream task cancelled.")
-        finally:
-            close_mic_stream(audio, mic_stream)
-            logger.info("🎤 Microphone stream closed.")
 
-    try:
-        audio, mic_stream = open_mic_stream()
-        task = loop.create_task(run_stream())
+@st.cache_resource
+def start_order_reloader():
+    # One watcher per server process, shared by every viewer and call
+    return OrderReloader().start()
 
-        # Poll for endstream flag, then cancel task if set
-        while not shared.get("endstream", False):
-            loop.run_until_complete(asyncio.sleep(0.1))
 
-        # When endstream is True:
-        task.cancel()
-        loop.run_until_complete(task)
-    except Exception as e:
-        logger.error(f"Exception in voice agent: {e}")
-    finally:
-        loop.close()
+@st.cache_resource
+def call_runner():
+    # One loop thread, microphone and speaker per server process, reused by
+    # every call; one connection is kept configured so the next call starts
+    # without the handshake. The greeting (recorded, or the agent's own
+    # rendered once) plays the moment a call starts.
+    prompts = PromptCache(AGENT_SETTINGS["audio"]["output"]["sample_rate"])
+    prompts.add_greeting(AGENT_SETTINGS)
+    return CallRunner(AGENT_URL, pool_size=1, prompts=prompts)
 
 
 def app():
     st.set_page_config(page_title="Deepgram Voice Agent", layout="wide")
+    start_order_reloader()
+    logs = log_bus()
+    runner = call_runner()
 
     st.markdown(
         """
@@ -122,8 +100,6 @@ def app():
         """
         )
 
-    if "thread" not in st.session_state:
-        st.session_state.thread = None
     if "shared" not in st.session_state:
         st.session_state.shared = {
             "endstream": False,
@@ -131,8 +107,15 @@ def app():
             "goodbye_triggered": False,
             "mic_on": True,
         }
-    if "function_responses" not in st.session_state:
-        st.session_state.function_responses = []
+    if "events" not in st.session_state:
+        st.session_state.events = EventBus()
+        st.session_state.event_cursor = 0
+        st.session_state.transcript = deque(maxlen=TRANSCRIPT_LINES)
+        st.session_state.function_responses = deque(maxlen=TRANSCRIPT_LINES)
+    if "log_cursor" not in st.session_state:
+        # New viewers only see logs from now on
+        st.session_state.log_cursor = logs.cursor
+        st.session_state.logs = deque(maxlen=LOG_LINES)
     if "call_running" not in st.session_state:
         st.session_state.call_running = False
     if "call_ended" not in st.session_state:
@@ -146,7 +129,7 @@ def app():
     if st.button(
         "🟢 Start Call", disabled=start_disabled, key="start_call", help="Start Call"
     ):
-        if st.session_state.thread and st.session_state.thread.is_alive():
+        if runner.running:
             st.warning("Call already running")
         else:
             st.session_state.shared = {
@@ -156,47 +139,41 @@ def app():
                 "mic_on": True,
             }
             st.session_state.function_responses.clear()
+            st.session_state.transcript.clear()
+            st.session_state.event_cursor = st.session_state.events.cursor
 
-            while not transcript_queue.empty():
-                try:
-                    transcript_queue.get_nowait()
-                except queue.Empty:
-                    break
-
-            st.session_state.thread = threading.Thread(
-                target=voice_agent_runner,
-                args=(st.session_state.shared, transcript_queue),
-                daemon=True,
-            )
-            st.session_state.thread.start()
+            runner.start_call(st.session_state.shared, st.session_state.events)
             st.session_state.call_running = True
             st.session_state.call_ended = False
             st.success("Call started")
 
     if st.button("🔴 End Call", disabled=end_disabled, key="end_call", help="End Call"):
-        if st.session_state.thread and st.session_state.thread.is_alive():
-            st.session_state.shared["endstream"] = True
-            st.success("Ending call...")
+        if runner.running:
+            runner.end_call()
+            st.success("Call ended")
         else:
             st.warning("No call is running")
 
-    if st.session_state.call_running:
-        if "last_function_response" in st.session_state.shared:
-            resp = st.session_state.shared.pop("last_function_response", None)
-            if resp:
-                st.session_state.function_responses.append(resp)
-
-    if (
-        st.session_state.thread
-        and not st.session_state.thread.is_alive()
-        and st.session_state.call_running
-    ):
+    for event in read_new_events(st.session_state.events, "event_cursor"):
+        if event["type"] == "conversation_text":
+            st.session_state.transcript.append(event)
+        elif event["type"] == "function_response":
+            st.session_state.function_responses.append(event["content"])
+    for event in read_new_events(logs, "log_cursor"):
+        st.session_state.logs.append(event["message"])
+
+    if st.session_state.call_running and not runner.running:
         st.session_state.call_running = False
         st.session_state.call_ended = True
 
     if st.session_state.call_ended:
         st.info("📞 Call ended. You can start a new call.")
 
+    if st.session_state.transcript:
+        st.markdown("### Transcript")
+        for event in st.session_state.transcript:
+            st.markdown(f"**{event['role']}:** {event['content']}")
+
     if st.session_state.function_responses:
         st.markdown("### Function Call Responses")
         for resp in st.session_state.function_responses:
@@ -204,7 +181,12 @@ def app():
                 f'<div class="function-response">{resp}</div>', unsafe_allow_html=True
             )
 
-    st_autorefresh(interval=1000, key="refresh")
+    with st.expander("Logs", expanded=False):
+        st.text("\n".join(st.session_state.logs))
+
+    # Idle viewers don't need to rerun at all
+    if st.session_state.call_running:
+        st_autorefresh(interval=1000, key="refresh")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,318 @@
+import time
+import wave
+import queue
+import socket
+import asyncio
+import logging
+import threading
+from collections import deque
+
+try:
+    import pyaudio
+except ImportError:
+    # Headless servers feed sessions from files, sockets or memory instead
+    pyaudio = None
+
+logger = logging.getLogger(__name__)
+
+RATE = 44100
+FRAMES_PER_BUFFER = 1024
+# About 1.2 s of audio at RATE; older frames are dropped if the loop falls behind
+MIC_QUEUE_FRAMES = 50
+
+# Sources produce mono linear16 audio at their own `rate`. read(num_frames)
+# blocks like a capture device and returns a memoryview over the audio;
+# an empty view means the source has ended. Sinks share Speaker's interface:
+# a context manager with async play(data), finish(), stop(received_at=None)
+# and stats(); a sink factory is called with the agent's output sample rate.
+
+
+def _require_pyaudio():
+    if pyaudio is None:
+        raise RuntimeError("PyAudio is not installed; use a file, socket or memory source")
+
+
+class PyAudioSource:
+    # Pass a shared pyaudio.PyAudio() as audio to leave its lifetime to the
+    # caller. pause()/resume() stop and restart capture between calls so a
+    # reused source doesn't hand out audio from before the call.
+    def __init__(self, rate=RATE, frames_per_buffer=FRAMES_PER_BUFFER, audio=None):
+        _require_pyaudio()
+        self.rate = rate
+        self._owns_audio = audio is None
+        self._audio = audio or pyaudio.PyAudio()
+        self._stream = self._audio.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=rate,
+            input=True,
+            frames_per_buffer=frames_per_buffer,
+        )
+
+    def read(self, num_frames):
+        return memoryview(self._stream.read(num_frames, exception_on_overflow=False))
+
+    def pause(self):
+        if self._stream.is_active():
+            self._stream.stop_stream()
+
+    def resume(self):
+        if self._stream.is_stopped():
+            self._stream.start_stream()
+
+    def close(self):
+        if self._stream:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._audio and self._owns_audio:
+            self._audio.terminate()
+        self._audio = None
+
+
+class WavSource:
+    # Replays a mono 16-bit WAV file at its own rate, paced like a device.
+    # speed > 1 delivers audio faster than real time; with loop=True the
+    # file repeats forever, otherwise the source ends with the file.
+    def __init__(self, path, speed=1.0, loop=False, offset=0):
+        with wave.open(path, "rb") as f:
+            if f.getnchannels() != 1 or f.getsampwidth() != 2:
+                raise ValueError(f"{path} must be mono 16-bit PCM")
+            self.rate = f.getframerate()
+            self._audio = memoryview(f.readframes(f.getnframes()))
+        self.speed = speed
+        self.loop = loop
+        self._pos = (offset * 2) % max(len(self._audio), 1) & ~1
+        self._next = None
+
+    def read(self, num_frames):
+        now = time.monotonic()
+        if self._next is None:
+            self._next = now
+        elif self._next > now:
+            time.sleep(self._next - now)
+        self._next += num_frames / self.rate / self.speed
+
+        end = self._pos + num_frames * 2
+        if end <= len(self._audio):
+            piece = self._audio[self._pos:end]
+            self._pos = end
+        elif not self.loop:
+            piece = self._audio[self._pos:]
+            self._pos = len(self._audio)
+        else:
+            # Only the wrap-around frame is stitched together
+            end -= len(self._audio)
+            piece = memoryview(bytes(self._audio[self._pos:]) + bytes(self._audio[:end]))
+            self._pos = end
+        return piece
+
+    def close(self):
+        pass
+
+
+class SocketSource:
+    # Raw linear16 audio from a connected stream socket, e.g. a telephony
+    # bridge. Each frame is received straight into its own buffer.
+    def __init__(self, sock, rate=8000):
+        self.sock = sock
+        self.rate = rate
+
+    def read(self, num_frames):
+        buf = bytearray(num_frames * 2)
+        view = memoryview(buf)
+        got = 0
+        while got < len(buf):
+            n = self.sock.recv_into(view[got:])
+            if not n:
+                break
+            got += n
+        return view[:got & ~1]
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class MemorySource:
+    # Frames pushed with feed() from any thread are handed out as they are,
+    # whatever num_frames asks for. close() ends the source once drained.
+    def __init__(self, rate=16000, frames=()):
+        self.rate = rate
+        self._frames = deque(memoryview(frame) for frame in frames)
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def feed(self, data):
+        with self._cond:
+            self._frames.append(memoryview(data))
+            self._cond.notify()
+
+    def read(self, num_frames):
+        with self._cond:
+            while not self._frames and not self._closed:
+                self._cond.wait()
+            return self._frames.popleft() if self._frames else memoryview(b"")
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class MicReader:
+    # Pulls frames from a blocking source on a dedicated thread and hands
+    # them to the event loop through a bounded queue, so the sender only
+    # ever awaits and never blocks the loop on the device. None is queued
+    # when the source ends.
+    def __init__(self, source, loop, maxsize=MIC_QUEUE_FRAMES, frames_per_buffer=FRAMES_PER_BUFFER):
+        self.source = source
+        self.loop = loop
+        self.frames_per_buffer = frames_per_buffer
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if wait:
+            self.join()
+
+    def join(self):
+        # Device reads return within one buffer, but an idle MemorySource or
+        # SocketSource can block until closed; run this off the event loop
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def clear(self):
+        while not self.queue.empty():
+            if self.queue.get_nowait() is None:
+                # Keep the end-of-source marker
+                self.queue.put_nowait(None)
+                break
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                piece = self.source.read(self.frames_per_buffer)
+                self.loop.call_soon_threadsafe(self._put, piece if len(piece) else None)
+                if not len(piece):
+                    break
+            except RuntimeError:
+                # Loop already closed
+                break
+            except Exception as e:
+                logger.error("Microphone read error: %s", e)
+                break
+
+    def _put(self, piece):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(piece)
+
+
+class NullSink:
+    # Counts agent audio instead of playing it
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.bytes_received = 0
+        self.barge_ins = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    async def play(self, data):
+        self.bytes_received += len(data)
+
+    def finish(self):
+        pass
+
+    def stop(self, received_at=None):
+        self.barge_ins += 1
+
+    def stats(self):
+        return {"bytes_received": self.bytes_received, "barge_ins": self.barge_ins}
+
+
+class MemorySink(NullSink):
+    # Keeps every agent audio message, without copying
+    def __init__(self, sample_rate):
+        super().__init__(sample_rate)
+        self.chunks = []
+
+    async def play(self, data):
+        await super().play(data)
+        self.chunks.append(data)
+
+    def audio(self):
+        return b"".join(self.chunks)
+
+
+class WavSink(NullSink):
+    # Records agent audio to a mono 16-bit WAV file; use
+    # functools.partial(WavSink, path=...) as the speaker factory. play()
+    # only queues the audio: a writer thread does the file I/O, and closes
+    # the file once everything queued before __exit__ is written.
+    # wait_closed() blocks until then. Queued audio must not be modified.
+    def __init__(self, sample_rate, path):
+        super().__init__(sample_rate)
+        self.path = path
+        self._queue = None
+        self._thread = None
+
+    def __enter__(self):
+        wav = wave.open(self.path, "wb")
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(self.sample_rate)
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write, args=(wav,), name="wav-sink")
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._queue.put(None)
+
+    def wait_closed(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    async def play(self, data):
+        await super().play(data)
+        self._queue.put(data)
+
+    def _write(self, wav):
+        try:
+            while (data := self._queue.get()) is not None:
+                wav.writeframesraw(data)
+        except Exception as e:
+            logger.error("WAV sink stopped: %s", e)
+        finally:
+            wav.close()
+
+
+class SocketSink(NullSink):
+    # Streams raw agent audio to a connected socket without blocking the
+    # loop; use functools.partial(SocketSink, sock=...) as the speaker factory
+    def __init__(self, sample_rate, sock):
+        super().__init__(sample_rate)
+        self.sock = sock
+        sock.setblocking(False)
+
+    async def play(self, data):
+        await super().play(data)
+        await asyncio.get_running_loop().sock_sendall(self.sock, data)
@@ -0,0 +1,174 @@
+import numpy as np
+
+ENCODINGS = ("linear16", "mulaw")
+
+
+def lowpass_taps(cutoff, num_taps=63):
+    # Blackman-windowed sinc; cutoff is a fraction of the sample rate (0-0.5)
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.blackman(num_taps)
+    return (taps / taps.sum()).astype(np.float32)
+
+
+class Resampler:
+    # Streaming linear16 resampler. Input is low-pass filtered below the new
+    # Nyquist rate and then linearly interpolated at the output positions;
+    # filter history and the fractional read position carry over between
+    # chunks so frame boundaries are seamless.
+    def __init__(self, in_rate, out_rate, num_taps=63):
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.ratio = in_rate / out_rate
+        self._taps = None
+        if out_rate < in_rate:
+            self._taps = lowpass_taps(0.45 * out_rate / in_rate, num_taps)
+            self._history = np.zeros(num_taps - 1, dtype=np.float32)
+        self._last = np.float32(0)
+        self._pos = 1.0
+
+    def process(self, pcm):
+        # pcm is any bytes-like object; it is read in place, not copied
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        if self.in_rate == self.out_rate:
+            return samples
+        x = samples.astype(np.float32)
+        if self._taps is not None:
+            padded = np.concatenate((self._history, x))
+            self._history = padded[len(padded) - len(self._history):]
+            x = np.convolve(padded, self._taps, mode="valid")
+
+        # buf[0] is the last sample of the previous chunk, so interpolation
+        # can straddle the boundary
+        n = len(x)
+        buf = np.empty(n + 1, dtype=np.float32)
+        buf[0] = self._last
+        buf[1:] = x
+        count = int(np.ceil((n - self._pos) / self.ratio)) if n > self._pos else 0
+        positions = self._pos + self.ratio * np.arange(count)
+        index = positions.astype(np.int64)
+        frac = (positions - index).astype(np.float32)
+        out = buf[index] * (1 - frac) + buf[np.minimum(index + 1, n)] * frac
+
+        self._pos += self.ratio * count - n
+        self._last = buf[n]
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16)
+
+
+def mulaw_encode(samples):
+    # G.711 mu-law, vectorized over an int16 array
+    x = samples.astype(np.int32)
+    sign = (x < 0).astype(np.int32) << 7
+    magnitude = np.minimum(np.abs(x), 32635) + 0x84
+    exponent = np.frexp(magnitude.astype(np.float64))[1] - 8
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+
+
+def encode(samples, encoding):
+    # Returns a byte view of the encoded samples; websockets sends it as is
+    if encoding == "linear16":
+        return memoryview(np.ascontiguousarray(samples, dtype="<i2")).cast("B")
+    if encoding == "mulaw":
+        return memoryview(mulaw_encode(samples)).cast("B")
+    raise ValueError(f"Unsupported encoding {encoding!r}, expected one of {ENCODINGS}")
+
+
+class VoiceActivityGate:
+    # Energy + spectral-flatness voice activity detector. A buffer counts as
+    # speech when its loudest 10 ms window is above both the absolute
+    # threshold and the tracked noise floor, and its spectrum is peaky
+    # rather than flat like hiss. Recent silent buffers are kept as pre-roll
+    # so the start of an utterance is not clipped, and audio keeps flowing
+    # for a hang-over period after speech so the agent's endpointing still
+    # sees the trailing silence.
+    def __init__(
+        self,
+        sample_rate,
+        threshold_db=-45.0,
+        noise_margin_db=10.0,
+        max_flatness=0.6,
+        pre_roll_ms=300,
+        hangover_ms=1000,
+    ):
+        self.sample_rate = sample_rate
+        self.threshold_db = threshold_db
+        self.noise_margin_db = noise_margin_db
+        self.max_flatness = max_flatness
+        self.pre_roll = int(sample_rate * pre_roll_ms / 1000)
+        self.hangover = int(sample_rate * hangover_ms / 1000)
+        self.noise_floor_db = threshold_db - noise_margin_db
+        self._window = max(1, sample_rate // 100)
+        self._pending = []
+        self._pending_samples = 0
+        self._since_speech = self.hangover + 1
+
+    def is_speech(self, samples):
+        if len(samples) == 0:
+            return False
+        x = samples.astype(np.float32) / 32768.0
+        window = min(self._window, len(x))
+        usable = len(x) - len(x) % window
+        energy = np.mean(x[:usable].reshape(-1, window) ** 2, axis=1).max()
+        energy_db = 10 * np.log10(energy + 1e-12)
+
+        speech = energy_db >= max(self.threshold_db, self.noise_floor_db + self.noise_margin_db)
+        if speech:
+            power = np.abs(np.fft.rfft(x)) ** 2 + 1e-12
+            flatness = np.exp(np.mean(np.log(power))) / np.mean(power)
+            speech = flatness < self.max_flatness
+        if not speech:
+            # Track the background level slowly while nobody is talking
+            self.noise_floor_db = 0.95 * self.noise_floor_db + 0.05 * energy_db
+        return bool(speech)
+
+    def process(self, samples):
+        # Returns the buffers that should be sent, oldest first
+        if self.is_speech(samples):
+            self._since_speech = 0
+        else:
+            self._since_speech += len(samples)
+
+        if self._since_speech <= self.hangover:
+            out = self._pending + [samples]
+            self._pending = []
+            self._pending_samples = 0
+            return out
+
+        self._pending.append(samples)
+        self._pending_samples += len(samples)
+        while self._pending and self._pending_samples - len(self._pending[0]) >= self.pre_roll:
+            self._pending_samples -= len(self._pending.pop(0))
+        return []
+
+
+class MicProcessor:
+    # Capture-rate linear16 in, bytes in the agent's configured input
+    # format out. With a VAD configured, silent stretches are held back and
+    # counted instead of sent.
+    def __init__(self, capture_rate, input_audio, vad=None):
+        self.encoding = input_audio.get("encoding", "linear16")
+        if self.encoding not in ENCODINGS:
+            raise ValueError(f"Unsupported encoding {self.encoding!r}, expected one of {ENCODINGS}")
+        self.resampler = Resampler(capture_rate, input_audio.get("sample_rate", capture_rate))
+        self.gate = None
+        if vad and vad.get("enabled", True):
+            options = {k: v for k, v in vad.items() if k != "enabled"}
+            self.gate = VoiceActivityGate(self.resampler.out_rate, **options)
+        self.bytes_sent = 0
+        self.bytes_suppressed = 0
+
+    def process(self, pcm):
+        samples = self.resampler.process(pcm)
+        if self.gate is None:
+            payloads = [encode(samples, self.encoding)]
+        else:
+            payloads = [encode(chunk, self.encoding) for chunk in self.gate.process(samples)]
+        size = len(samples) * (2 if self.encoding == "linear16" else 1)
+        sent = sum(len(payload) for payload in payloads)
+        self.bytes_sent += sent
+        # Pre-roll can release more than this buffer's worth at speech onset
+        self.bytes_suppressed += size - sent
+        return payloads
+
+    def stats(self):
+        return {"bytes_sent": self.bytes_sent, "bytes_suppressed": self.bytes_suppressed}
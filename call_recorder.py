@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import wave
+import queue
+import logging
+import threading
+
+import numpy as np
+
+from audio_processing import Resampler
+
+logger = logging.getLogger(__name__)
+
+# Audio is kept this long in memory before it is written, so agent audio
+# that arrives ahead of playback can still be cut on barge-in
+WINDOW_SECONDS = 30
+# Written audio trails the wall clock by this much, for late mic frames
+FLUSH_DELAY_SECONDS = 1.0
+# Caller audio arriving this much later than expected starts after a gap
+CALLER_GAP_SECONDS = 0.25
+# Items waiting for the writer; beyond this they are dropped and counted
+RECORDER_QUEUE_SIZE = 2000
+
+CALLER, AGENT, EVENT, STOP = range(4)
+
+
+def events_path_for(wav_path):
+    return os.path.splitext(wav_path)[0] + ".jsonl"
+
+
+class CallRecorder:
+    # Records a call as a stereo WAV (left: caller, right: agent) and a
+    # JSONL event track whose t_ms is measured from the WAV's first sample.
+    # caller_audio(), agent_audio() and event() only timestamp the data and
+    # queue a reference to it; a writer thread resamples, places it on the
+    # timeline in a preallocated window and writes audio out once it is
+    # FLUSH_DELAY_SECONDS old. Agent audio is laid out back to back the way
+    # the speaker plays it, and a user_started_speaking event cuts off what
+    # had not been played yet. Queued data must not be modified afterwards.
+    def __init__(
+        self,
+        path,
+        caller_rate,
+        agent_rate,
+        sample_rate=None,
+        events_path=None,
+        window_seconds=WINDOW_SECONDS,
+        queue_size=RECORDER_QUEUE_SIZE,
+    ):
+        self.path = path
+        self.events_path = events_path or events_path_for(path)
+        self.sample_rate = sample_rate or agent_rate
+        self._resamplers = {
+            CALLER: Resampler(caller_rate, self.sample_rate),
+            AGENT: Resampler(agent_rate, self.sample_rate),
+        }
+        self._window = np.zeros((int(window_seconds * self.sample_rate), 2), dtype=np.int16)
+        self._queue = queue.Queue(queue_size)
+        self._written = 0
+        self._cursor = {CALLER: 0, AGENT: 0}
+        self.dropped_items = 0
+        self.overflow_frames = 0
+        self.late_frames = 0
+        self._wav = None
+        self._events = None
+        self._thread = None
+        self._start = None
+
+    def start(self):
+        self._wav = wave.open(self.path, "wb")
+        self._wav.setnchannels(2)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(self.sample_rate)
+        self._events = open(self.events_path, "w")
+        self._start = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="call-recorder", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        if self._thread is None:
+            return
+        # Waits for the stop marker even when the queue is full
+        self._queue.put((STOP, time.monotonic(), None))
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def caller_audio(self, pcm):
+        self._put(CALLER, pcm)
+
+    def agent_audio(self, pcm):
+        self._put(AGENT, pcm)
+
+    def event(self, event_type, **fields):
+        self._put(EVENT, (event_type, fields))
+
+    def _put(self, kind, data):
+        try:
+            self._queue.put_nowait((kind, time.monotonic(), data))
+        except queue.Full:
+            self.dropped_items += 1
+
+    def stats(self):
+        return {
+            "seconds": round(self._written / self.sample_rate, 3),
+            "dropped_items": self.dropped_items,
+            "overflow_frames": self.overflow_frames,
+            "late_frames": self.late_frames,
+        }
+
+    def _frame_at(self, t):
+        return int((t - self._start) * self.sample_rate)
+
+    def _run(self):
+        delay = int(FLUSH_DELAY_SECONDS * self.sample_rate)
+        try:
+            while True:
+                try:
+                    kind, t, data = self._queue.get(timeout=0.2)
+                except queue.Empty:
+                    kind = None
+                if kind == STOP:
+                    break
+                if kind == EVENT:
+                    self._write_event(t, *data)
+                elif kind is not None:
+                    self._add_audio(kind, t, data)
+                self._flush(self._frame_at(time.monotonic()) - delay)
+            self._flush(max(self._cursor.values()))
+            summary = {"type": "recording", "sample_rate": self.sample_rate, **self.stats()}
+            self._events.write(json.dumps(summary) + "\n")
+        except Exception as e:
+            logger.error("Call recorder stopped: %s", e)
+        finally:
+            self._wav.close()
+            self._events.close()
+
+    def _write_event(self, t, event_type, fields):
+        now = self._frame_at(t)
+        if event_type == "user_started_speaking" and self._cursor[AGENT] > now:
+            # The speaker drops whatever it had not played yet
+            cut = max(now, self._written)
+            if cut < self._cursor[AGENT]:
+                self._place(AGENT, cut, np.zeros(self._cursor[AGENT] - cut, dtype=np.int16))
+            self._cursor[AGENT] = now
+        entry = {"t_ms": round((t - self._start) * 1000, 2), "type": event_type, **fields}
+        self._events.write(json.dumps(entry, default=str) + "\n")
+
+    def _add_audio(self, kind, t, pcm):
+        samples = self._resamplers[kind].process(pcm)
+        if not len(samples):
+            return
+        arrived = self._frame_at(t)
+        if kind == CALLER:
+            # Mic frames were captured just before they arrived
+            expected = arrived - len(samples)
+            if expected - self._cursor[CALLER] > CALLER_GAP_SECONDS * self.sample_rate:
+                self._cursor[CALLER] = expected
+        else:
+            # Agent audio queues up behind what is still playing
+            self._cursor[AGENT] = max(self._cursor[AGENT], arrived)
+        self._place(kind, self._cursor[kind], samples)
+        self._cursor[kind] += len(samples)
+
+    def _place(self, channel, pos, samples):
+        size = len(self._window)
+        if pos < self._written:
+            late = min(self._written - pos, len(samples))
+            self.late_frames += late
+            samples = samples[late:]
+            pos += late
+        room = self._written + size - pos
+        if len(samples) > room:
+            self.overflow_frames += len(samples) - max(room, 0)
+            samples = samples[:max(room, 0)]
+        start = pos % size
+        first = min(len(samples), size - start)
+        self._window[start:start + first, channel] = samples[:first]
+        self._window[:len(samples) - first, channel] = samples[first:]
+
+    def _flush(self, until):
+        size = len(self._window)
+        while self._written < until:
+            start = self._written % size
+            end = min(start + until - self._written, size)
+            block = self._window[start:end]
+            self._wav.writeframesraw(memoryview(block).cast("B"))
+            block[:] = 0
+            self._written += end - start
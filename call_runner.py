@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import threading
+
+from agent_config import AGENT_SETTINGS
+from audio_io import RATE, PyAudioSource, pyaudio
+from connection_pool import ConnectionPool
+from main import start_stream
+from speaker import Speaker
+
+logger = logging.getLogger(__name__)
+
+
+class _KeepOpen:
+    # Hands a long-lived sink to start_stream without letting the call
+    # close it on exit. Audio still queued when the call ends is dropped, so
+    # a hang-up is silent at once and the next call starts on an empty buffer.
+    def __init__(self, sink):
+        self.sink = sink
+
+    def __getattr__(self, name):
+        return getattr(self.sink, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.sink.stop()
+
+
+class CallRunner:
+    # Runs agent calls on one long-lived event loop thread. The microphone,
+    # speaker and PyAudio instance are opened on the first call and reused
+    # afterwards; with pool_size > 0, configured agent connections are kept
+    # warm between calls. start_call() and end_call() can be used from any
+    # thread and take effect on the loop right away. With a
+    # prompt_cache.PromptCache, its greeting plays as soon as a call starts.
+    def __init__(
+        self,
+        uri,
+        settings=AGENT_SETTINGS,
+        pool_size=0,
+        source_factory=None,
+        speaker_factory=None,
+        prompts=None,
+    ):
+        self.uri = uri
+        self.prompts = prompts
+        # Pooled connections must be configured the way calls will ask for
+        self.settings = prompts.settings_for(settings) if prompts is not None else settings
+        self.source_factory = source_factory
+        self.speaker_factory = speaker_factory
+        self._audio = None
+        self._source = None
+        self._speaker = None
+        self._task = None
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="call-runner", daemon=True)
+        self._thread.start()
+        self.connections = None
+        if pool_size:
+            self.connections = ConnectionPool(uri, self.settings, pool_size)
+            self.loop.call_soon_threadsafe(self.connections.start)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    @property
+    def running(self):
+        task = self._task
+        return task is not None and not task.done()
+
+    def start_call(self, shared, events=None, timeout=5.0):
+        # Blocks only until the call task exists (or fails to start)
+        future = asyncio.run_coroutine_threadsafe(self._start(shared, events), self.loop)
+        return future.result(timeout)
+
+    def end_call(self):
+        self.loop.call_soon_threadsafe(self._cancel)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+    async def _start(self, shared, events):
+        if self.running:
+            raise RuntimeError("A call is already running")
+        self._open_devices()
+        self._task = asyncio.create_task(self._call(shared, events))
+
+    def _cancel(self):
+        if self.running:
+            self._task.cancel()
+
+    def _open_devices(self):
+        output_rate = self.settings["audio"]["output"]["sample_rate"]
+        if self.source_factory is None or self.speaker_factory is None:
+            if self._audio is None and pyaudio is not None:
+                self._audio = pyaudio.PyAudio()
+        if self._source is None:
+            if self.source_factory:
+                self._source = self.source_factory()
+            else:
+                self._source = PyAudioSource(RATE, audio=self._audio)
+        if self._speaker is None:
+            if self.speaker_factory:
+                self._speaker = self.speaker_factory(output_rate)
+            else:
+                self._speaker = Speaker(output_rate, audio=self._audio)
+            self._speaker.__enter__()
+
+    async def _call(self, shared, events):
+        if hasattr(self._source, "resume"):
+            self._source.resume()
+        try:
+            await start_stream(
+                self._source,
+                self.uri,
+                shared,
+                self.settings,
+                speaker_factory=lambda sample_rate: _KeepOpen(self._speaker),
+                connections=self.connections,
+                events=events,
+                prompts=self.prompts,
+            )
+        except asyncio.CancelledError:
+            logger.info("Call ended by the user.")
+        finally:
+            if hasattr(self._source, "pause"):
+                self._source.pause()
+
+    async def _close(self):
+        self._cancel()
+        if self._task:
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self.connections is not None:
+            await self.connections.close()
+        if self._speaker is not None:
+            self._speaker.__exit__(None, None, None)
+            self._speaker = None
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+        if self._audio is not None:
+            self._audio.terminate()
+            self._audio = None
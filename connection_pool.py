@@ -0,0 +1,309 @@
+import os
+import copy
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+
+import websockets
+from websockets.exceptions import ConnectionClosed, ConnectionClosedOK
+from websockets.protocol import State
+
+from agent_config import AGENT_SETTINGS, KEEPALIVE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# About 10 s of 16 kHz linear16 audio held back while reconnecting
+RECONNECT_BUFFER_BYTES = 320000
+RECONNECT_ATTEMPTS = 3
+RECONNECT_BACKOFF = 0.25
+
+
+def agent_headers():
+    return {"Authorization": f"Token {os.environ.get('DEEPGRAM_API_KEY')}"}
+
+
+async def _configure(uri, settings, headers):
+    # Connects and sends Settings; returns the socket once the agent has
+    # applied them, together with every message received up to that point
+    # (Welcome, SettingsApplied) so they can be replayed to the call.
+    # Audio doesn't deflate, so compression would only burn CPU.
+    ws = await websockets.connect(uri, additional_headers=headers, compression=None)
+    try:
+        await ws.send(json.dumps(settings))
+        received = []
+        while True:
+            message = await ws.recv()
+            received.append(message)
+            if isinstance(message, str):
+                msg_type = json.loads(message).get("type")
+                if msg_type == "SettingsApplied":
+                    return ws, received
+                if msg_type == "Error":
+                    raise RuntimeError(f"Agent rejected settings: {message}")
+    except BaseException:
+        await ws.close()
+        raise
+
+
+async def open_connection(uri, settings=AGENT_SETTINGS, headers=None, reconnect=True):
+    headers = headers or agent_headers()
+    ws, received = await _configure(uri, settings, headers)
+    return AgentConnection(uri, settings, headers, ws, received, reconnect)
+
+
+class AgentConnection:
+    # A configured agent websocket. Iterating yields the messages received
+    # before the call took it over first, then live ones. If the socket
+    # drops mid-call it is re-established as a continuation of the call: no
+    # greeting, and the conversation so far passed in as context. Audio sent
+    # meanwhile is held (bounded, oldest dropped) and flushed once the new
+    # socket is ready, and other messages are dropped.
+    def __init__(self, uri, settings, headers, ws, received=(), reconnect=True):
+        self.uri = uri
+        self.settings = settings
+        self.headers = headers
+        self.reconnect = reconnect
+        self.created_at = time.monotonic()
+        self.reconnects = 0
+        self.dropped_bytes = 0
+        self._ws = ws
+        self._received = deque(received)
+        self._history = []
+        self._backlog = deque()
+        self._backlog_bytes = 0
+        self._ready = asyncio.Event()
+        self._ready.set()
+        self._reconnecting = None
+        self._closing = False
+        self._idle_tasks = ()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    @property
+    def closed(self):
+        return self._closing or self._ws.state is State.CLOSED
+
+    async def close(self):
+        self._closing = True
+        await self.unpark()
+        if self._reconnecting:
+            self._reconnecting.cancel()
+        await self._ws.close()
+
+    async def send(self, message):
+        if self._ready.is_set():
+            ws = self._ws
+            try:
+                await ws.send(message)
+                return
+            except ConnectionClosedOK:
+                raise
+            except ConnectionClosed:
+                if not self.reconnect or self._closing:
+                    raise
+                self._start_reconnect(ws)
+        if isinstance(message, str):
+            # Keep-alives and replies meant for the lost session are moot
+            return
+        self._backlog.append(message)
+        self._backlog_bytes += len(message)
+        while self._backlog_bytes > RECONNECT_BUFFER_BYTES:
+            dropped = self._backlog.popleft()
+            self._backlog_bytes -= len(dropped)
+            self.dropped_bytes += len(dropped)
+
+    async def __aiter__(self):
+        while True:
+            if self._received:
+                yield self._received.popleft()
+                continue
+            ws = self._ws
+            try:
+                message = await ws.recv()
+            except ConnectionClosedOK:
+                return
+            except ConnectionClosed:
+                if not self.reconnect or self._closing:
+                    raise
+                self._start_reconnect(ws)
+                await self._ready.wait()
+                if self._ws is ws:
+                    raise
+                continue
+            self._remember(message)
+            yield message
+
+    def _remember(self, message):
+        # Keeps what was said so a reconnect can pick the conversation up
+        if isinstance(message, str) and '"ConversationText"' in message:
+            msg = json.loads(message)
+            if msg.get("type") == "ConversationText":
+                self._history.append(
+                    {"type": "History", "role": msg.get("role"), "content": msg.get("content", "")}
+                )
+
+    def _resume_settings(self):
+        settings = copy.deepcopy(self.settings)
+        agent = settings.setdefault("agent", {})
+        agent.pop("greeting", None)
+        if self._history:
+            context = agent.setdefault("context", {})
+            context["messages"] = [*context.get("messages", []), *self._history]
+        return settings
+
+    def _start_reconnect(self, failed_ws):
+        if failed_ws is not self._ws or (self._reconnecting and not self._reconnecting.done()):
+            return
+        self._ready.clear()
+        self._reconnecting = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        try:
+            for attempt in range(RECONNECT_ATTEMPTS):
+                try:
+                    ws, received = await _configure(self.uri, self._resume_settings(), self.headers)
+                except Exception as e:
+                    logger.warning("Reconnect attempt %s failed: %s", attempt + 1, e)
+                    await asyncio.sleep(RECONNECT_BACKOFF * 2**attempt)
+                    continue
+                while self._backlog:
+                    message = self._backlog.popleft()
+                    self._backlog_bytes -= len(message)
+                    await ws.send(message)
+                self._ws = ws
+                self._received.extend(received)
+                self.reconnects += 1
+                logger.info("Agent connection re-established (%s so far)", self.reconnects)
+                return
+            logger.error("Giving up on reconnecting to the agent")
+            self.reconnect = False
+        finally:
+            # Waiters re-check self._ws to tell success from failure
+            self._ready.set()
+
+    def park(self, keepalive_interval=KEEPALIVE_INTERVAL):
+        # While waiting in a pool, keep the agent from timing the socket out
+        # and hold on to whatever it sends (e.g. the greeting). Reading and
+        # keep-alives are separate tasks: wrapping recv() in wait_for can
+        # lose a message that lands as the timeout fires.
+        self._idle_tasks = (
+            asyncio.create_task(self._hold_messages()),
+            asyncio.create_task(self._keep_alive(keepalive_interval)),
+        )
+
+    async def unpark(self):
+        tasks, self._idle_tasks = self._idle_tasks, ()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return not self.closed
+
+    async def _hold_messages(self):
+        while True:
+            self._received.append(await self._ws.recv())
+
+    async def _keep_alive(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            await self._ws.send(json.dumps({"type": "KeepAlive"}))
+
+    def stats(self):
+        return {"reconnects": self.reconnects, "dropped_bytes": self.dropped_bytes}
+
+
+class ConnectionPool:
+    # Keeps `size` agent connections open and already configured with
+    # `settings`, so a call can start streaming without waiting for the
+    # handshake. Taken connections are replaced in the background, and idle
+    # ones older than max_idle seconds are recycled before the agent gives
+    # up on them. Calls with other settings get a fresh connection.
+    def __init__(self, uri, settings=AGENT_SETTINGS, size=2, max_idle=60.0, headers=None):
+        self.uri = uri
+        self.settings = settings
+        self.size = size
+        self.max_idle = max_idle
+        self.headers = headers
+        self.hits = 0
+        self.misses = 0
+        self._idle = deque()
+        self._wake = None
+        self._refill_task = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def __len__(self):
+        return len(self._idle)
+
+    def start(self):
+        if self._refill_task is None:
+            self._wake = asyncio.Event()
+            self._refill_task = asyncio.create_task(self._refill())
+        return self
+
+    async def close(self):
+        if self._refill_task:
+            self._refill_task.cancel()
+            await asyncio.gather(self._refill_task, return_exceptions=True)
+            self._refill_task = None
+        while self._idle:
+            await self._idle.popleft().close()
+
+    async def acquire(self, settings=None):
+        settings = settings or self.settings
+        if settings == self.settings:
+            while self._idle:
+                conn = self._idle.popleft()
+                self._wake.set()
+                if await conn.unpark():
+                    self.hits += 1
+                    return conn
+                await conn.close()
+        self.misses += 1
+        return await open_connection(self.uri, settings, self.headers)
+
+    async def _refill(self):
+        failures = 0
+        while True:
+            now = time.monotonic()
+            while self._idle and now - self._idle[0].created_at > self.max_idle:
+                await self._idle.popleft().close()
+            for conn in [c for c in self._idle if c.closed]:
+                self._idle.remove(conn)
+                await conn.close()
+            if len(self._idle) < self.size:
+                try:
+                    conn = await open_connection(self.uri, self.settings, self.headers)
+                except Exception as e:
+                    failures += 1
+                    logger.warning("Could not pre-warm an agent connection: %s", e)
+                    await asyncio.sleep(min(RECONNECT_BACKOFF * 2**failures, 30.0))
+                    continue
+                failures = 0
+                conn.park()
+                self._idle.append(conn)
+                continue
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.max_idle / 4)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "idle": len(self._idle),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
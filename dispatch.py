@@ -0,0 +1,84 @@
+import json
+import asyncio
+import logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+if orjson is not None:
+    JSON_CODEC = "orjson"
+
+    def loads(data):
+        return orjson.loads(data)
+
+    def dumps(obj):
+        # Agent control messages must go out as text frames
+        return orjson.dumps(obj).decode()
+
+else:
+    JSON_CODEC = "json"
+    loads = json.loads
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    dumps = _encoder.encode
+
+# Returned by a handler to end the receive loop
+STOP = object()
+
+
+class Dispatcher:
+    # Routes agent messages to the handlers registered for their type, in
+    # registration order. Text frames are decoded once with the fastest JSON
+    # codec available; binary frames go to the `binary` handler. Handlers
+    # take the message and may be plain functions or coroutines; if any
+    # returns STOP, dispatch() returns STOP once the rest have run.
+    def __init__(self, binary=None, default=None):
+        self._handlers = {}
+        self._binary = None
+        self._default = ()
+        if binary is not None:
+            self.on_binary(binary)
+        if default is not None:
+            self.on_default(default)
+
+    def __contains__(self, msg_type):
+        return msg_type in self._handlers
+
+    def register(self, msg_type, handler):
+        entry = (handler, asyncio.iscoroutinefunction(handler))
+        self._handlers[msg_type] = self._handlers.get(msg_type, ()) + (entry,)
+        return handler
+
+    def on(self, msg_type):
+        # Decorator form of register()
+        return lambda handler: self.register(msg_type, handler)
+
+    def update(self, handlers):
+        # {msg_type: handler or [handlers]}, e.g. a session's extra handlers
+        for msg_type, handler in (handlers or {}).items():
+            for h in handler if isinstance(handler, (list, tuple)) else (handler,):
+                self.register(msg_type, h)
+
+    def on_binary(self, handler):
+        self._binary = (handler, asyncio.iscoroutinefunction(handler))
+
+    def on_default(self, handler):
+        # Called for message types nothing is registered for
+        self._default = ((handler, asyncio.iscoroutinefunction(handler)),)
+
+    async def dispatch(self, message):
+        if isinstance(message, (bytes, bytearray, memoryview)):
+            if self._binary is None:
+                return None
+            handler, is_async = self._binary
+            return await handler(message) if is_async else handler(message)
+        msg = loads(message)
+        handlers = self._handlers.get(msg.get("type", "unknown"), self._default)
+        result = None
+        for handler, is_async in handlers:
+            if (await handler(msg) if is_async else handler(msg)) is STOP:
+                result = STOP
+        return result
@@ -0,0 +1,107 @@
+import json
+import time
+import asyncio
+import argparse
+
+from dispatch import JSON_CODEC, Dispatcher, dumps
+
+# The receiver's message types, in the order the old if/elif chain tested them
+MESSAGE_TYPES = [
+    "Welcome",
+    "SettingsApplied",
+    "ConversationText",
+    "UserStartedSpeaking",
+    "AgentAudioDone",
+    "FunctionCallRequest",
+    "FunctionCallResponse",
+    "Error",
+    "Warning",
+]
+
+
+def sample_messages():
+    # One turn's worth of text frames; the agent's audio is mixed in by main()
+    return [
+        dumps({"type": "UserStartedSpeaking"}),
+        dumps({"type": "ConversationText", "role": "user", "content": "What's the status of order 10023?"}),
+        dumps(
+            {
+                "type": "FunctionCallRequest",
+                "functions": [
+                    {
+                        "id": "call-1",
+                        "name": "get_order_status",
+                        "arguments": '{"order_id": "10023"}',
+                        "client_side": True,
+                    }
+                ],
+            }
+        ),
+        dumps({"type": "ConversationText", "role": "assistant", "content": "Order 10023 has shipped."}),
+        dumps({"type": "AgentAudioDone"}),
+        dumps({"type": "History", "role": "assistant", "content": "Order 10023 has shipped."}),
+    ]
+
+
+async def chain(message):
+    # What the receiver did before dispatch.py: decode, then walk the chain
+    if isinstance(message, bytes):
+        return
+    msg = json.loads(message)
+    msg_type = msg.get("type", "unknown")
+    for known in MESSAGE_TYPES:
+        if msg_type == known:
+            return
+    return
+
+
+def build_dispatcher(extra_types):
+    def handler(msg):
+        pass
+
+    async def audio(data):
+        pass
+
+    dispatcher = Dispatcher(binary=audio, default=handler)
+    for msg_type in MESSAGE_TYPES:
+        dispatcher.register(msg_type, handler)
+    for index in range(extra_types):
+        dispatcher.register(f"Custom{index}", handler)
+    return dispatcher
+
+
+async def measure(dispatch, messages, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for message in messages:
+            await dispatch(message)
+    elapsed = time.perf_counter() - started
+    count = rounds * len(messages)
+    return {"messages_per_s": round(count / elapsed), "us_per_message": round(elapsed / count * 1e6, 3)}
+
+
+async def main(args):
+    text = sample_messages()
+    audio = [bytes(args.audio_bytes)] * args.audio_per_turn
+    messages = text[:2] + audio + text[2:]
+    report = {"json_codec": JSON_CODEC, "messages_per_round": len(messages)}
+    report["if_elif_chain"] = await measure(chain, messages, args.rounds)
+    for extra in sorted({0, args.extra_types}):
+        report[f"dispatcher_{len(MESSAGE_TYPES) + extra}_types"] = await measure(
+            build_dispatcher(extra).dispatch, messages, args.rounds
+        )
+    report["dispatcher_text_only"] = await measure(build_dispatcher(0).dispatch, text, args.rounds)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("dispatch_benchmark")
+    parser.add_argument("--rounds", help="Simulated turns to dispatch", type=int, default=20000)
+    parser.add_argument("--audio-per-turn", help="Agent audio messages per turn", type=int, default=10)
+    parser.add_argument("--audio-bytes", type=int, default=3840)
+    parser.add_argument(
+        "--extra-types", help="Additional handler types to register", type=int, default=100
+    )
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
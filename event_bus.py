@@ -0,0 +1,51 @@
+import time
+import logging
+import threading
+
+
+class EventBus:
+    # Fixed-capacity ring of call events. Every event gets the next sequence
+    # number; readers keep their own cursor (the next sequence they want)
+    # and only ever copy out what is new. When a reader falls more than
+    # `capacity` events behind, the oldest ones are gone and it resumes from
+    # the oldest still held. Safe to publish from any thread.
+    def __init__(self, capacity=500):
+        self.capacity = capacity
+        self._ring = [None] * capacity
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._next, self.capacity)
+
+    @property
+    def cursor(self):
+        # Sequence number the next event will get
+        return self._next
+
+    def publish(self, event_type, **fields):
+        with self._lock:
+            seq = self._next
+            self._ring[seq % self.capacity] = {"seq": seq, "time": time.time(), "type": event_type, **fields}
+            self._next = seq + 1
+            return seq
+
+    def read(self, cursor=0, limit=None):
+        # Returns (events, next_cursor)
+        with self._lock:
+            start = max(cursor, self._next - self.capacity, 0)
+            end = self._next if limit is None else min(self._next, start + limit)
+            return [self._ring[seq % self.capacity] for seq in range(start, end)], end
+
+
+class EventBusHandler(logging.Handler):
+    # Publishes formatted log records as "log" events
+    def __init__(self, bus, level=logging.NOTSET):
+        super().__init__(level)
+        self.bus = bus
+
+    def emit(self, record):
+        try:
+            self.bus.publish("log", level=record.levelname, message=self.format(record))
+        except Exception:
+            self.handleError(record)
@@ -0,0 +1,98 @@
+import json
+import time
+import threading
+import functools
+from collections import OrderedDict
+
+from agent_functions import data_version, normalize_order_id
+
+# Functions whose result is not a pure lookup and must always run
+UNCACHED_FUNCTIONS = ("end_story",)
+
+
+class FunctionCache:
+    # LRU + TTL cache of function results keyed by function name and
+    # normalized arguments. Entries are dropped wholesale whenever the order
+    # data version changes (see agent_functions.reload_store).
+    def __init__(self, max_entries=1024, ttl=300.0, version=data_version, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._version = version
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._data_version = version()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _key(self, name, kwargs):
+        if isinstance(kwargs.get("order_id"), str):
+            kwargs = {**kwargs, "order_id": normalize_order_id(kwargs["order_id"])}
+        return name, json.dumps(kwargs, sort_keys=True)
+
+    def get(self, name, kwargs):
+        key = self._key(name, kwargs)
+        now = self._clock()
+        with self._lock:
+            version = self._version()
+            if version != self._data_version:
+                self._entries.clear()
+                self._data_version = version
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, name, kwargs, value, version=None):
+        key = self._key(name, kwargs)
+        with self._lock:
+            # A result computed against older data must not outlive the reload
+            if version is not None and version != self._data_version:
+                return
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def wrap(self, name, func):
+        @functools.wraps(func)
+        def cached(**kwargs):
+            version = self._version()
+            found, value = self.get(name, kwargs)
+            if found:
+                return value
+            value = func(**kwargs)
+            self.put(name, kwargs, value, version)
+            return value
+
+        return cached
+
+    def wrap_map(self, function_map):
+        return {
+            name: func if name in UNCACHED_FUNCTIONS else self.wrap(name, func)
+            for name, func in function_map.items()
+        }
+
+
+FUNCTION_CACHE = FunctionCache()
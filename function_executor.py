@@ -0,0 +1,63 @@
+import json
+import asyncio
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 2.0
+
+
+def new_pool(max_workers=4):
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-function")
+
+
+class FunctionExecutor:
+    # Runs agent functions on a bounded thread pool so that lookups never
+    # execute on the event loop. Each call has its own timeout; a call that
+    # overruns is answered with an error and left to finish in the background.
+    # Passing a pool shares it between executors; it is then not shut down here.
+    def __init__(
+        self,
+        function_map,
+        max_workers=4,
+        timeouts=None,
+        default_timeout=DEFAULT_TIMEOUT,
+        pool=None,
+    ):
+        self.function_map = function_map
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self._owns_pool = pool is None
+        self._pool = pool or new_pool(max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def shutdown(self):
+        if self._owns_pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    async def call(self, name, arguments="{}"):
+        func = self.function_map.get(name)
+        if not func:
+            return "Function not found."
+        timeout = self.timeouts.get(name, self.default_timeout)
+        try:
+            kwargs = json.loads(arguments or "{}")
+            logger.debug("Function args: %s", kwargs)
+            loop = asyncio.get_running_loop()
+            return await asyncio.wait_for(
+                loop.run_in_executor(self._pool, functools.partial(func, **kwargs)),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.error("Function %s timed out after %ss", name, timeout)
+            return "Function timed out."
+        except Exception as e:
+            logger.error("Error calling function %s: %s", name, e)
+            return "Function execution failed."
@@ -0,0 +1,38 @@
+# Characters tried when generating near-miss ids; spoken ids are digits
+ID_ALPHABET = "0123456789"
+
+
+def near_misses(word, alphabet=ID_ALPHABET):
+    # Every string one edit away from word: deletions, adjacent swaps, and
+    # substitutions and insertions drawn from alphabet
+    variants = set()
+    for i in range(len(word) + 1):
+        head, tail = word[:i], word[i:]
+        if tail:
+            variants.add(head + tail[1:])
+        if len(tail) > 1:
+            variants.add(head + tail[1] + tail[0] + tail[2:])
+        for c in alphabet:
+            variants.add(head + c + tail)
+            if tail:
+                variants.add(head + c + tail[1:])
+    variants.discard(word)
+    return variants
+
+
+def near_matches(query, resolve, limit=3, resolve_all=None):
+    # Ids within one edit of query, found by checking each of the query's
+    # near misses against an existing id lookup, so nothing is built or kept
+    # in memory. resolve(id) returns the stored id, or None if there is none;
+    # resolve_all(ids), if given, returns the stored ones among many ids in
+    # one go. An exact match is returned on its own.
+    exact = resolve(query)
+    if exact is not None:
+        return [exact]
+    variants = near_misses(query.lower())
+    if resolve_all is not None:
+        found = set(resolve_all(variants))
+    else:
+        found = {resolve(variant) for variant in variants}
+        found.discard(None)
+    return sorted(found)[:limit]
@@ -0,0 +1,128 @@
+import json
+import time
+import asyncio
+import logging
+import argparse
+
+from agent_config import AGENT_SETTINGS, VAD_SETTINGS, build_settings
+from audio_io import NullSink, WavSource
+from log_pipeline import LogPipeline
+from mock_agent_server import MockAgentServer
+from session_manager import SessionManager
+from turn_trace import percentile
+
+PREAMBLE_WAV = "./data/preamble.wav"
+
+
+def summarize(results, wall_time, cpu_time):
+    def collect(metric, stat="p50"):
+        return [r["turns"][metric][stat] for r in results if r["turns"].get(metric, {}).get(stat) is not None]
+
+    sent = sum(r["mic"].get("bytes_sent", 0) for r in results)
+    received = sum(r["speaker"].get("bytes_received", 0) for r in results)
+    report = {
+        "callers": len(results),
+        "completed": sum(1 for r in results if r["completed"]),
+        "wall_time_s": round(wall_time, 3),
+        "cpu_time_s": round(cpu_time, 3),
+        "mic_bytes_sent": sent,
+        "agent_bytes_received": received,
+        "throughput_kbps": round((sent + received) * 8 / 1000 / wall_time, 1) if wall_time else None,
+    }
+    setup = [r["setup_ms"] for r in results if r.get("setup_ms") is not None]
+    report["setup_ms"] = {
+        "p50": percentile(setup, 50),
+        "p90": percentile(setup, 90),
+        "max": max(setup) if setup else None,
+    }
+    for metric in ("time_to_first_audio_ms", "function_round_trip_ms"):
+        values = collect(metric)
+        report[metric] = {
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "max": max(values) if values else None,
+        }
+    return report
+
+
+async def main(args):
+    settings = build_settings(args.input_encoding, args.input_rate)
+    vad = {**VAD_SETTINGS, "enabled": not args.no_vad}
+    uri = args.url
+    server = None
+    if uri is None:
+        # No agent given: run the mock in this process
+        mock = MockAgentServer(speed=args.speed)
+        server = await mock.serve("127.0.0.1", args.port)
+        uri = f"ws://127.0.0.1:{args.port}"
+
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    manager = SessionManager(
+        uri,
+        args.max_sessions,
+        settings,
+        vad,
+        speaker_factory=NullSink,
+        history=args.callers,
+        pool_size=args.pool_size,
+    )
+    async with manager:
+        for index in range(args.callers):
+            # Callers start at different points of the file so they don't
+            # all talk in lockstep
+            source = WavSource(args.wav, args.speed, loop=True, offset=index * 7000)
+            manager.start(source, session_id=f"caller-{index}")
+            if args.ramp:
+                await asyncio.sleep(args.ramp / args.callers)
+        await manager.wait()
+    results = [session.metrics() for session in manager.finished]
+    report = summarize(results, time.perf_counter() - started, time.process_time() - cpu_started)
+    report["sessions"] = manager.stats()
+
+    if server is not None:
+        report["server"] = mock.stats()
+        server.close()
+        await server.wait_closed()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("load_generator")
+    parser.add_argument(
+        "url",
+        help="WebSocket URL of the agent; starts a local mock agent when omitted",
+        type=str,
+        nargs="?",
+        default=None,
+    )
+    parser.add_argument("--callers", help="Number of simulated callers", type=int, default=10)
+    parser.add_argument(
+        "--max-sessions", help="Callers connected at the same time", type=int, default=200
+    )
+    parser.add_argument(
+        "--pool-size", help="Pre-warmed agent connections kept ready", type=int, default=0
+    )
+    parser.add_argument("--ramp", help="Seconds over which callers are started", type=float, default=1.0)
+    parser.add_argument("--wav", help="Mono 16-bit WAV replayed as mic input", type=str, default=PREAMBLE_WAV)
+    parser.add_argument("--speed", help="Speed-up factor for mic audio and the mock script", type=float, default=1.0)
+    parser.add_argument("--port", help="Port for the local mock agent", type=int, default=8765)
+    parser.add_argument(
+        "--input-rate", type=int, default=AGENT_SETTINGS["audio"]["input"]["sample_rate"]
+    )
+    parser.add_argument(
+        "--input-encoding", type=str, default=AGENT_SETTINGS["audio"]["input"]["encoding"]
+    )
+    parser.add_argument("--no-vad", action="store_true")
+    parser.add_argument(
+        "--loglevel",
+        type=str,
+        default="WARNING",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+    )
+    parser.add_argument("--log-format", type=str, default="text", choices=["text", "jsonl"])
+    args = parser.parse_args()
+
+    # Hundreds of sessions log from one loop; keep the writes off it
+    with LogPipeline(getattr(logging, args.loglevel), args.log_format == "jsonl"):
+        asyncio.run(main(args))
@@ -0,0 +1,133 @@
+import json
+import queue
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+TEXT_FORMAT = "%(levelname)-8s %(asctime)s %(name)-12s %(message)s"
+# Records waiting for the writer thread; beyond this they are dropped
+LOG_QUEUE_SIZE = 10000
+
+
+class JsonLinesFormatter(logging.Formatter):
+    # One JSON object per record. msg_type (see SampleFilter) and any fields
+    # passed as extra={"fields": {...}} are kept as their own keys.
+    def format(self, record):
+        entry = {
+            "time": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        msg_type = getattr(record, "msg_type", None)
+        if msg_type is not None:
+            entry["msg_type"] = msg_type
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, separators=(",", ":"))
+
+
+class SampleFilter(logging.Filter):
+    # Keeps one in every rates[msg_type] records logged with
+    # extra={"msg_type": ...}; types not listed, and records without a
+    # msg_type, always pass. Warnings and errors are never sampled.
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+        self.seen = {}
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        rate = self.rates.get(getattr(record, "msg_type", None), 1)
+        if rate <= 1 or record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            count = self.seen.get(record.msg_type, 0)
+            self.seen[record.msg_type] = count + 1
+            if count % rate:
+                self.dropped += 1
+                return False
+        return True
+
+
+def parse_sample_rates(specs):
+    # ["ConversationText=10", ...] -> {"ConversationText": 10}
+    rates = {}
+    for spec in specs or ():
+        msg_type, _, rate = spec.partition("=")
+        if not msg_type or not rate.isdigit() or int(rate) < 1:
+            raise ValueError(f"Expected MSG_TYPE=N with N >= 1, got {spec!r}")
+        rates[msg_type] = int(rate)
+    return rates
+
+
+class _LazyQueueHandler(QueueHandler):
+    # The stock prepare() formats every record on the logging thread; here
+    # the record goes on the queue as it is and the writer thread formats
+    # it. Arguments must not be mutated after they are logged.
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    # Routes a logger (the root logger by default) through a bounded queue
+    # to `handlers` running on a background thread, so logging calls on the
+    # event loop only filter the record and enqueue it. Without handlers a
+    # stderr StreamHandler is used, writing text or JSON lines.
+    def __init__(
+        self,
+        level=logging.INFO,
+        jsonl=False,
+        sample=None,
+        handlers=None,
+        logger=None,
+        queue_size=LOG_QUEUE_SIZE,
+    ):
+        self.logger = logger or logging.getLogger()
+        self.level = level
+        if handlers is None:
+            handler = logging.StreamHandler()
+            handler.setFormatter(JsonLinesFormatter() if jsonl else logging.Formatter(TEXT_FORMAT))
+            handlers = [handler]
+        self.handlers = handlers
+        self.sampler = SampleFilter(sample or {})
+        self.queue_handler = _LazyQueueHandler(queue.Queue(queue_size))
+        self.queue_handler.addFilter(self.sampler)
+        self.listener = QueueListener(self.queue_handler.queue, *handlers, respect_handler_level=True)
+
+    def start(self):
+        self.logger.setLevel(self.level)
+        self.logger.addHandler(self.queue_handler)
+        self.listener.start()
+        return self
+
+    def stop(self):
+        # Flushes whatever is still queued
+        self.logger.removeHandler(self.queue_handler)
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def stats(self):
+        return {
+            "queued": self.queue_handler.queue.qsize(),
+            "dropped_full": self.queue_handler.dropped,
+            "dropped_sampled": self.sampler.dropped,
+        }
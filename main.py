@@ -1,15 +1,24 @@
-import os
 import json
+import time
 import asyncio
 import logging
 import argparse
-import pyaudio
-import websockets
 from websockets.exceptions import ConnectionClosedOK
 
-from agent_config import AGENT_SETTINGS
+from agent_config import AGENT_SETTINGS, KEEPALIVE_INTERVAL, VAD_SETTINGS, build_settings
 from agent_functions import FUNCTION_MAP
+from audio_io import RATE, MicReader, PyAudioSource
+from audio_processing import ENCODINGS, MicProcessor
+from call_recorder import CallRecorder
+from connection_pool import open_connection
+from dispatch import STOP, Dispatcher, dumps
+from function_cache import FUNCTION_CACHE
+from function_executor import FunctionExecutor
+from log_pipeline import LogPipeline, parse_sample_rates
+from order_reloader import OrderReloader
+from prompt_cache import FILLER_DELAY, PromptCache
 from speaker import Speaker
+from turn_trace import TurnTracer
 
 logger = logging.getLogger("__name__")
 
@@ -19,20 +28,11 @@ from dotenv import load_dotenv  # Ensure this import is here
 load_dotenv()
 
 
-def configure_logger(loglevel):
-    level = getattr(logging, loglevel.upper(), logging.DEBUG)
+def configure_logger(loglevel, jsonl=False, sample=None):
+    # Log records are written by a background thread; see log_pipeline.py
+    level = getattr(logging, loglevel.upper(), logging.INFO)
     logger.setLevel(level)
-    formatter = logging.Formatter("%(levelname)-8s %(asctime)s %(name)-12s %(message)s")
-    streamhandler = logging.StreamHandler()
-    streamhandler.setFormatter(formatter)
-    if not logger.hasHandlers():
-        logger.addHandler(streamhandler)
-
-
-FORMAT = pyaudio.paInt16
-CHANNELS = 1
-RATE = 44100
-FRAMES_PER_BUFFER = 1024
+    return LogPipeline(level, jsonl, sample).start()
 
 
 def _handle_task_result(task):
@@ -44,189 +44,369 @@ def _handle_task_result(task):
         logger.error("Exception raised by task = %r", task)
 
 
-async def start_stream(mic_stream, uri, shared):
-    extra_headers = {"Authorization": f"Token {os.environ.get('DEEPGRAM_API_KEY')}"}
-    logger.debug(f"Connecting to {uri}")
+async def start_stream(
+    source,
+    uri,
+    shared,
+    settings=AGENT_SETTINGS,
+    vad=VAD_SETTINGS,
+    trace_path=None,
+    speaker_factory=Speaker,
+    function_map=FUNCTION_MAP,
+    pool=None,
+    connections=None,
+    events=None,
+    handlers=None,
+    record_path=None,
+    prompts=None,
+):
+    logger.debug("Connecting to %s", uri)
+
+    # Cached results are shared between calls, so only the stock functions
+    # use the cache; a session's own functions may answer differently
+    if function_map is FUNCTION_MAP:
+        function_map = FUNCTION_CACHE.wrap_map(function_map)
+    executor = FunctionExecutor(function_map, pool=pool)
+    pending_calls = set()
+    agent_ready = asyncio.Event()
+    tracer = TurnTracer(trace_path)
+    # Converts captured audio to whatever the Settings message announces
+    processor = MicProcessor(source.rate, settings["audio"]["input"], vad)
+    loop = asyncio.get_running_loop()
+    mic = MicReader(source, loop).start()
+    connection = None
+    output_rate = settings.get("audio", {}).get("output", {}).get("sample_rate", 16000)
+    # Both audio directions and the call events are recorded off the loop
+    recorder = None
+    if record_path:
+        recorder = CallRecorder(record_path, source.rate, output_rate).start()
+
+    def publish(event_type, **fields):
+        # Call events for UIs and monitors; see event_bus.EventBus
+        if events is not None:
+            events.publish(event_type, **fields)
+        if recorder is not None:
+            recorder.event(event_type, **fields)
+
+    # Cached prompts (see prompt_cache.PromptCache) play through the same
+    # speaker as the agent; agent audio simply queues up behind them
+    speaker = None
+    filler = None
+    filler_until = 0.0
+    if prompts is not None:
+        settings = prompts.settings_for(settings)
+        filler = prompts.get("one_moment")
+
+    async def play_prompt(name):
+        tracer.mark("local_prompt", name=name)
+        publish("prompt", name=name)
+        audio = prompts.get(name)
+        if recorder is not None:
+            recorder.agent_audio(audio)
+        await speaker.play(audio)
+        speaker.finish()
 
     try:
-        async with websockets.connect(uri, additional_headers=extra_headers) as ws:
+        # Open the speaker before connecting so the greeting starts at once
+        speaker = speaker_factory(output_rate).__enter__()
+        if prompts is not None and "greeting" in prompts:
+            await play_prompt("greeting")
+
+        # A pooled connection arrives already configured; otherwise Settings
+        # are sent and applied here. Either way the Welcome and
+        # SettingsApplied messages are replayed to the receiver.
+        setup_started = loop.time()
+        if connections is not None:
+            connection = await connections.acquire(settings)
+        else:
+            connection = await open_connection(uri, settings)
+        shared["setup_ms"] = round((loop.time() - setup_started) * 1000, 2)
+        logger.info("Agent connection ready in %s ms", shared["setup_ms"])
+        publish("status", status="connected", setup_ms=shared["setup_ms"])
+        async with connection as ws:
+
+            async def sender(ws, shared):
+                await agent_ready.wait()
+                # Drop whatever was captured while the agent was starting up
+                mic.clear()
+                last_sent = loop.time()
 
-            async def sender(mic_stream, ws, shared):
-                await ws.send(json.dumps(AGENT_SETTINGS))
                 while True:
-                    if shared.get("endstream", False):
-                        await ws.send(b"")
-                        break
+                    # Mic is always on now; no mic_on check
+                    piece = await mic.queue.get()
 
-                    if not shared.get("agent_ready", False):
-                        await asyncio.sleep(0.1)
-                        continue
+                    if piece is None:
+                        # The source ended, e.g. the caller's line hung up
+                        logger.info("Audio source ended, closing connection.")
+                        shared["endstream"] = True
 
-                    # Mic is always on now; no mic_on check
+                    if shared.get("endstream", False):
+                        try:
+                            await ws.send(b"")
+                        except ConnectionClosedOK:
+                            pass
+                        break
 
+                    if recorder is not None:
+                        recorder.caller_audio(piece)
                     try:
-                        piece = mic_stream.read(
-                            FRAMES_PER_BUFFER, exception_on_overflow=False
-                        )
-                        await ws.send(piece)
+                        payloads = processor.process(piece)
+                        for payload in payloads:
+                            await ws.send(payload)
+                        now = loop.time()
+                        if payloads:
+                            last_sent = now
+                        elif now - last_sent >= KEEPALIVE_INTERVAL:
+                            await ws.send(json.dumps({"type": "KeepAlive"}))
+                            last_sent = now
                     except ConnectionClosedOK:
                         logger.info("WebSocket closed normally, sender stopping.")
                         break
                     except Exception as e:
-                        logger.error(f"Sender error: {e}")
+                        logger.error("Sender error: %s", e)
                         break
 
-                    await asyncio.sleep(0.01)
+            async def respond(fid, name, arguments):
+                nonlocal filler_until
+                tracer.mark("function_start", id=fid, name=name)
+                call = asyncio.ensure_future(executor.call(name, arguments))
+                try:
+                    if filler is not None:
+                        done, _ = await asyncio.wait({call}, timeout=FILLER_DELAY)
+                        # One filler at a time when several calls are slow
+                        if not done and loop.time() >= filler_until:
+                            filler_until = loop.time() + prompts.duration("one_moment")
+                            await play_prompt("one_moment")
+                    funcresponse = await call
+                finally:
+                    call.cancel()
+                tracer.mark("function_end", id=fid, name=name)
+                response = {
+                    "type": "FunctionCallResponse",
+                    "id": fid,
+                    "name": name,
+                    "content": funcresponse,
+                }
+                await ws.send(dumps(response))
+                tracer.mark("function_response_sent", id=fid, name=name)
+                publish("function_response", name=name, content=funcresponse)
 
             async def receiver(ws, shared):
-                speaker = Speaker(
-                    AGENT_SETTINGS.get("audio", {})
-                    .get("output", {})
-                    .get("sample_rate", 16000)
-                )
-                with speaker:
-                    async for msg in ws:
-                        try:
-                            if isinstance(msg, bytes):
-                                await speaker.play(msg)
-                                continue
-
-                            msg = json.loads(msg)
-                            msg_type = msg.get("type", "unknown")
-
-                            if msg_type == "Welcome":
-                                logger.info(
-                                    f"Welcome received. Request id: {msg.get('request_id', '')}"
-                                )
-
-                            elif msg_type == "SettingsApplied":
-                                logger.info("Settings applied, streaming microphone")
-                                shared["agent_ready"] = True
-
-                            elif msg_type == "ConversationText":
-                                content = msg.get("content", "").strip()
-                                logger.info(
-                                    f"Role: {msg.get('role')} | Content: {content}"
-                                )
-
-                            elif msg_type == "UserStartedSpeaking":
-                                logger.info("User started speaking. Stopping speaker")
-                                speaker.stop()
-
-                            elif msg_type == "AgentAudioDone":
-                                logger.info("Agent finished speaking.")
-                                if shared.get("goodbye_triggered", False):
-                                    logger.info(
-                                        "Farewell audio done, closing connection."
-                                    )
-                                    shared["endstream"] = True
-                                    await ws.send(b"")
-                                    await ws.close()
-                                    break
-
-                            elif msg_type == "FunctionCallRequest":
-                                logger.info(
-                                    f"Agent requested function call: {json.dumps(msg, indent=2)}"
-                                )
-                                for function_obj in msg.get("functions", []):
-                                    fid = function_obj.get("id")
-                                    name = function_obj.get("name")
-                                    arguments = function_obj.get("arguments", "{}")
-                                    func = FUNCTION_MAP.get(name)
-
-                                    if name == "end_story":
-                                        logger.info(
-                                            "Received 'end_story' function call, shutting down."
-                                        )
-                                        response = {
-                                            "type": "FunctionCallResponse",
-                                            "id": fid,
-                                            "name": name,
-                                            "content": "Bye, it was nice talking to you! 👋",
-                                        }
-                                        await ws.send(json.dumps(response))
-                                        shared["goodbye_triggered"] = True
-                                        continue
-
-                                    funcresponse = "Function not found."
-                                    if func:
-                                        try:
-                                            kwargs = json.loads(arguments)
-                                            logger.debug(f"Function args: {kwargs}")
-                                            funcresponse = func(**kwargs)
-                                        except Exception as e:
-                                            logger.error(
-                                                f"Error calling function {name}: {e}"
-                                            )
-                                            funcresponse = "Function execution failed."
-
-                                    response = {
-                                        "type": "FunctionCallResponse",
-                                        "id": fid,
-                                        "name": name,
-                                        "content": funcresponse,
-                                    }
-                                    await ws.send(
-                                        json.dumps(response, separators=(",", ":"))
-                                    )
-
-                            elif msg_type == "FunctionCallResponse":
-                                content = msg.get("content", "").strip()
-                                logger.info(
-                                    f"Role: assistant | FunctionResponse: {content}"
-                                )
-
-                            elif msg_type in ["Error", "Warning"]:
-                                logger.warning(f"{msg_type}: {msg}")
-                            else:
-                                logger.debug(f"Unhandled message type: {msg_type}")
-                        except Exception as e:
-                            logger.error(
-                                f"Receiver exception on msg: {msg}, Error: {e}"
-                            )
-
-            loop = asyncio.get_event_loop()
-            send_task = loop.create_task(sender(mic_stream, ws, shared))
+                async def on_audio(data):
+                    tracer.agent_audio()
+                    if recorder is not None:
+                        recorder.agent_audio(data)
+                    await speaker.play(data)
+
+                def on_welcome(msg):
+                    logger.info(
+                        "Welcome received. Request id: %s",
+                        msg.get("request_id", ""),
+                        extra={"msg_type": "Welcome"},
+                    )
+
+                def on_settings_applied(msg):
+                    logger.info(
+                        "Settings applied, streaming microphone",
+                        extra={"msg_type": "SettingsApplied"},
+                    )
+                    shared["agent_ready"] = True
+                    publish("status", status="ready")
+                    agent_ready.set()
+
+                def on_conversation_text(msg):
+                    tracer.mark("conversation_text", role=msg.get("role"))
+                    content = msg.get("content", "").strip()
+                    publish("conversation_text", role=msg.get("role"), content=content)
+                    logger.info(
+                        "Role: %s | Content: %s",
+                        msg.get("role"),
+                        content,
+                        extra={"msg_type": "ConversationText"},
+                    )
+
+                def on_user_started_speaking(msg):
+                    # Barge-in latency is measured from the frame's arrival
+                    speaker.stop(received_at=received_at)
+                    tracer.start_turn()
+                    tracer.mark("user_started_speaking")
+                    publish("user_started_speaking")
+                    logger.info(
+                        "User started speaking. Stopping speaker",
+                        extra={"msg_type": "UserStartedSpeaking"},
+                    )
+
+                async def on_agent_audio_done(msg):
+                    logger.info("Agent finished speaking.", extra={"msg_type": "AgentAudioDone"})
+                    speaker.finish()
+                    tracer.mark("agent_audio_done")
+                    publish("agent_audio_done")
+                    tracer.end_turn()
+                    if shared.get("goodbye_triggered", False):
+                        logger.info("Farewell audio done, closing connection.")
+                        shared["endstream"] = True
+                        await ws.send(b"")
+                        await ws.close()
+                        return STOP
+
+                async def on_function_call_request(msg):
+                    tracer.mark(
+                        "function_call_request",
+                        ids=[f.get("id") for f in msg.get("functions", [])],
+                    )
+                    # Pretty-printing is only worth it when the record is
+                    # actually written
+                    if logger.isEnabledFor(logging.INFO):
+                        logger.info(
+                            "Agent requested function call: %s",
+                            json.dumps(msg, indent=2),
+                            extra={"msg_type": "FunctionCallRequest"},
+                        )
+                    for function_obj in msg.get("functions", []):
+                        fid = function_obj.get("id")
+                        name = function_obj.get("name")
+                        arguments = function_obj.get("arguments", "{}")
+                        publish("function_call", name=name, arguments=arguments)
+
+                        if name == "end_story":
+                            logger.info("Received 'end_story' function call, shutting down.")
+                            response = {
+                                "type": "FunctionCallResponse",
+                                "id": fid,
+                                "name": name,
+                                "content": "Bye, it was nice talking to you! 👋",
+                            }
+                            await ws.send(dumps(response))
+                            publish("function_response", name=name, content=response["content"])
+                            shared["goodbye_triggered"] = True
+                            continue
+
+                        # Run off the loop and answer each call as soon as
+                        # it finishes
+                        task = asyncio.create_task(respond(fid, name, arguments))
+                        pending_calls.add(task)
+                        task.add_done_callback(pending_calls.discard)
+                        task.add_done_callback(_handle_task_result)
+
+                def on_function_call_response(msg):
+                    content = msg.get("content", "").strip()
+                    logger.info(
+                        "Role: assistant | FunctionResponse: %s",
+                        content,
+                        extra={"msg_type": "FunctionCallResponse"},
+                    )
+
+                def on_problem(msg):
+                    msg_type = msg.get("type")
+                    logger.warning("%s: %s", msg_type, msg, extra={"msg_type": msg_type})
+
+                def on_unhandled(msg):
+                    msg_type = msg.get("type", "unknown")
+                    logger.debug(
+                        "Unhandled message type: %s", msg_type, extra={"msg_type": msg_type}
+                    )
+
+                dispatcher = Dispatcher(binary=on_audio, default=on_unhandled)
+                dispatcher.register("Welcome", on_welcome)
+                dispatcher.register("SettingsApplied", on_settings_applied)
+                dispatcher.register("ConversationText", on_conversation_text)
+                dispatcher.register("UserStartedSpeaking", on_user_started_speaking)
+                dispatcher.register("AgentAudioDone", on_agent_audio_done)
+                dispatcher.register("FunctionCallRequest", on_function_call_request)
+                dispatcher.register("FunctionCallResponse", on_function_call_response)
+                dispatcher.register("Error", on_problem)
+                dispatcher.register("Warning", on_problem)
+                # Caller-supplied handlers run after the built-in ones
+                dispatcher.update(handlers)
+
+                received_at = None
+                async for msg in ws:
+                    received_at = time.perf_counter()
+                    try:
+                        if await dispatcher.dispatch(msg) is STOP:
+                            break
+                    except Exception as e:
+                        logger.error("Receiver exception on msg: %s, Error: %s", msg, e)
+
+            send_task = loop.create_task(sender(ws, shared))
             recv_task = loop.create_task(receiver(ws, shared))
             send_task.add_done_callback(_handle_task_result)
             recv_task.add_done_callback(_handle_task_result)
-            await asyncio.wait([send_task, recv_task])
+            try:
+                # Either side finishing ends the call; the sender may
+                # otherwise wait forever on a ready signal or mic frame
+                await asyncio.wait(
+                    [send_task, recv_task], return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                for task in [send_task, recv_task, *pending_calls]:
+                    task.cancel()
+                await asyncio.gather(send_task, recv_task, return_exceptions=True)
 
     except Exception as e:
-        logger.error(f"Caught exception: {e}")
-
-
-def open_mic_stream():
-    audio = pyaudio.PyAudio()
-    stream = audio.open(
-        format=FORMAT,
-        channels=CHANNELS,
-        rate=RATE,
-        input=True,
-        frames_per_buffer=FRAMES_PER_BUFFER,
-    )
-    return audio, stream
-
-
-def close_mic_stream(audio, stream):
-    if stream:
-        stream.stop_stream()
-        stream.close()
-    if audio:
-        audio.terminate()
-
-
-def run_voiceagent(uri):
+        logger.error("Caught exception: %s", e)
+    finally:
+        mic.stop(wait=False)
+        executor.shutdown()
+        if speaker is not None:
+            shared["speaker_stats"] = speaker.stats()
+            logger.info("Speaker stats: %s", shared["speaker_stats"])
+            speaker.__exit__(None, None, None)
+        if connection is not None:
+            shared["connection_stats"] = connection.stats()
+        logger.info("Function cache stats: %s", FUNCTION_CACHE.stats())
+        shared["mic_stats"] = processor.stats()
+        logger.info("Microphone audio stats: %s", shared["mic_stats"])
+        tracer.close()
+        shared["turn_summary"] = tracer.summary()
+        logger.info("Turn latency summary: %s", shared["turn_summary"])
+        # The reader may be stuck in a read until the source is closed,
+        # which the caller only does after this returns
+        await loop.run_in_executor(None, mic.join)
+        publish("status", status="ended")
+        if recorder is not None:
+            # Writing out the last second of audio shouldn't stall other calls
+            await loop.run_in_executor(None, recorder.close)
+            shared["recording_stats"] = recorder.stats()
+            logger.info("Recording stats: %s", shared["recording_stats"])
+
+
+def run_voiceagent(
+    uri,
+    settings=AGENT_SETTINGS,
+    vad=VAD_SETTINGS,
+    trace_path=None,
+    record_path=None,
+    local_prompts=True,
+):
     shared_data = {"endstream": False, "agent_ready": False, "goodbye_triggered": False}
-    audio, mic_stream = open_mic_stream()
+    # Loaded before the mic opens so the greeting can play immediately
+    prompts = None
+    if local_prompts:
+        prompts = PromptCache(settings["audio"]["output"]["sample_rate"])
+        prompts.add_greeting(settings)
+    source = PyAudioSource(RATE)
+    reloader = OrderReloader().start()
     try:
-        asyncio.run(start_stream(mic_stream, uri, shared_data))
+        asyncio.run(
+            start_stream(
+                source,
+                uri,
+                shared_data,
+                settings,
+                vad,
+                trace_path,
+                record_path=record_path,
+                prompts=prompts,
+            )
+        )
     except KeyboardInterrupt:
         logger.info(
             "👋 Shutting down gracefully on keyboard interrupt (Ctrl+C). Goodbye!"
         )
     finally:
-        close_mic_stream(audio, mic_stream)
+        reloader.stop()
+        source.close()
         logger.info("🎤 Microphone stream closed.")
 
 
@@ -243,10 +423,73 @@ if __name__ == "__main__":
         "--loglevel",
         help="Set logging level",
         type=str,
-        default="DEBUG",
+        default="INFO",
         choices=["DEBUG", "INFO", "WARNING", "ERROR"],
     )
+    parser.add_argument(
+        "--log-format",
+        help="Write log records as text or as JSON lines",
+        type=str,
+        default="text",
+        choices=["text", "jsonl"],
+    )
+    parser.add_argument(
+        "--log-sample",
+        help="Log only one in N agent messages of a type, e.g. ConversationText=10 (repeatable)",
+        action="append",
+        default=[],
+        metavar="MSG_TYPE=N",
+    )
+    parser.add_argument(
+        "--input-rate",
+        help="Sample rate the microphone audio is resampled to before sending",
+        type=int,
+        default=AGENT_SETTINGS["audio"]["input"]["sample_rate"],
+    )
+    parser.add_argument(
+        "--input-encoding",
+        help="Encoding of the microphone audio sent to the agent",
+        type=str,
+        default=AGENT_SETTINGS["audio"]["input"]["encoding"],
+        choices=ENCODINGS,
+    )
+    parser.add_argument(
+        "--no-vad",
+        help="Stream every microphone frame instead of only speech",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--trace",
+        help="Append a per-turn latency timeline to this JSONL file",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--record",
+        help="Record the call to this stereo WAV file, with its events in a .jsonl next to it",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--no-local-prompts",
+        help="Don't play cached prompts (data/prompts/*.wav); the agent speaks its own greeting",
+        action="store_true",
+    )
     args = parser.parse_args()
 
-    configure_logger(args.loglevel)
-    run_voiceagent(args.url)
+    try:
+        sample = parse_sample_rates(args.log_sample)
+    except ValueError as e:
+        parser.error(str(e))
+    logs = configure_logger(args.loglevel, args.log_format == "jsonl", sample)
+    try:
+        run_voiceagent(
+            args.url,
+            build_settings(args.input_encoding, args.input_rate),
+            {**VAD_SETTINGS, "enabled": not args.no_vad},
+            args.trace,
+            args.record,
+            not args.no_local_prompts,
+        )
+    finally:
+        logs.stop()
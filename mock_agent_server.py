@@ -0,0 +1,227 @@
+import json
+import uuid
+import asyncio
+import logging
+import argparse
+import websockets
+
+logger = logging.getLogger(__name__)
+
+# Each turn waits until the caller has streamed after_audio seconds of audio
+# (or timeout seconds have passed), then plays out the agent side of the
+# exchange. Function calls are sent as a FunctionCallRequest and the turn
+# waits for every FunctionCallResponse before "speaking".
+DEFAULT_SCRIPT = {
+    "greeting_seconds": 2.0,
+    "turns": [
+        {
+            "user": "What is the status of order one oh four five one?",
+            "functions": [
+                {"name": "get_order_status", "arguments": {"order_id": "one oh four five one"}}
+            ],
+            "agent_audio_seconds": 1.5,
+        },
+        {
+            "user": "Tell me about order ten one two three.",
+            "functions": [
+                {"name": "get_order_summary", "arguments": {"order_id": "ten one two three"}}
+            ],
+            "agent_audio_seconds": 3.0,
+        },
+        {
+            "user": "That's all, goodbye.",
+            "functions": [{"name": "end_story", "arguments": {}}],
+            "agent_audio_seconds": 1.0,
+        },
+    ],
+}
+
+BYTES_PER_SAMPLE = {"linear16": 2, "mulaw": 1}
+AUDIO_CHUNK_SECONDS = 0.02
+
+
+class MockAgentServer:
+    def __init__(self, script=DEFAULT_SCRIPT, speed=1.0):
+        self.script = script
+        # Scales every wait in the script; >1 runs turns faster
+        self.speed = speed
+        self.connections = 0
+        self.completed = 0
+        self.function_round_trips_ms = []
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        return await websockets.serve(self.handle, host, port, compression=None)
+
+    async def handle(self, ws, *_):
+        # *_ absorbs the path argument older websockets versions pass
+        self.connections += 1
+        session = _Session(self, ws)
+        try:
+            await session.run()
+            self.completed += 1
+        except websockets.ConnectionClosed:
+            pass
+        except Exception as e:
+            logger.error("Mock session failed: %s", e)
+        finally:
+            session.close()
+
+    def stats(self):
+        latencies = sorted(self.function_round_trips_ms)
+        return {
+            "connections": self.connections,
+            "completed": self.completed,
+            "function_calls": len(latencies),
+            "function_round_trip_p50_ms": latencies[len(latencies) // 2] if latencies else None,
+            "function_round_trip_max_ms": latencies[-1] if latencies else None,
+        }
+
+
+class _Session:
+    def __init__(self, server, ws):
+        self.server = server
+        self.ws = ws
+        self.loop = asyncio.get_running_loop()
+        self.audio_bytes = 0
+        self.audio_bytes_per_second = 0
+        self.output_bytes_per_second = 32000
+        self.audio_changed = asyncio.Event()
+        self.responses = {}
+        self.reader = None
+
+    def close(self):
+        if self.reader:
+            self.reader.cancel()
+
+    async def send_json(self, message):
+        await self.ws.send(json.dumps(message))
+
+    async def run(self):
+        await self.send_json({"type": "Welcome", "request_id": str(uuid.uuid4())})
+        settings = json.loads(await self.ws.recv())
+        if settings.get("type") != "Settings":
+            await self.send_json({"type": "Error", "description": "Expected Settings"})
+            return
+        audio = settings.get("audio", {})
+        audio_in = audio.get("input", {})
+        self.audio_bytes_per_second = audio_in.get("sample_rate", 16000) * BYTES_PER_SAMPLE.get(
+            audio_in.get("encoding", "linear16"), 2
+        )
+        self.output_bytes_per_second = audio.get("output", {}).get("sample_rate", 16000) * 2
+        await self.send_json({"type": "SettingsApplied"})
+        self.reader = asyncio.create_task(self.read())
+
+        await self.speak(self.server.script.get("greeting_seconds", 0))
+        for turn in self.server.script["turns"]:
+            await self.wait_for_caller(turn.get("after_audio", 1.0), turn.get("timeout", 5.0))
+            await self.send_json({"type": "UserStartedSpeaking"})
+            await self.send_json(
+                {"type": "ConversationText", "role": "user", "content": turn.get("user", "")}
+            )
+            replies = await self.call_functions(turn.get("functions", []))
+            await self.send_json(
+                {
+                    "type": "ConversationText",
+                    "role": "assistant",
+                    "content": " ".join(replies) or turn.get("agent", ""),
+                }
+            )
+            await self.speak(turn.get("agent_audio_seconds", 1.0))
+
+        # Give the client a moment to hang up on its own after the farewell
+        try:
+            await asyncio.wait_for(asyncio.shield(self.reader), 5.0)
+        except asyncio.TimeoutError:
+            await self.ws.close()
+
+    async def read(self):
+        async for message in self.ws:
+            if isinstance(message, bytes):
+                self.audio_bytes += len(message)
+                self.audio_changed.set()
+                continue
+            message = json.loads(message)
+            if message.get("type") == "FunctionCallResponse":
+                future = self.responses.pop(message.get("id"), None)
+                if future and not future.done():
+                    future.set_result(message)
+
+    async def wait_for_caller(self, after_audio, timeout):
+        target = self.audio_bytes + after_audio * self.audio_bytes_per_second
+        deadline = self.loop.time() + timeout / self.server.speed
+        while self.audio_bytes < target and self.loop.time() < deadline:
+            self.audio_changed.clear()
+            try:
+                await asyncio.wait_for(self.audio_changed.wait(), deadline - self.loop.time())
+            except asyncio.TimeoutError:
+                break
+
+    async def call_functions(self, functions):
+        if not functions:
+            return []
+        request = {"type": "FunctionCallRequest", "functions": []}
+        futures = []
+        for function in functions:
+            fid = str(uuid.uuid4())
+            self.responses[fid] = self.loop.create_future()
+            futures.append(self.responses[fid])
+            request["functions"].append(
+                {
+                    "id": fid,
+                    "name": function["name"],
+                    "arguments": json.dumps(function.get("arguments", {})),
+                    "client_side": True,
+                }
+            )
+        sent_at = self.loop.time()
+        await self.send_json(request)
+        replies = []
+        for future in futures:
+            try:
+                response = await asyncio.wait_for(future, 10.0)
+            except asyncio.TimeoutError:
+                replies.append("(function timed out)")
+                continue
+            self.server.function_round_trips_ms.append(round((self.loop.time() - sent_at) * 1000, 2))
+            replies.append(str(response.get("content", "")))
+        return replies
+
+    async def speak(self, seconds):
+        # Silence standing in for TTS audio, streamed faster than real time
+        # the way the real agent does
+        if seconds <= 0:
+            return
+        chunk = bytes(int(self.output_bytes_per_second * AUDIO_CHUNK_SECONDS) & ~1)
+        for _ in range(int(seconds / AUDIO_CHUNK_SECONDS)):
+            await self.ws.send(chunk)
+            await asyncio.sleep(AUDIO_CHUNK_SECONDS / 4 / self.server.speed)
+        await self.send_json({"type": "AgentAudioDone"})
+
+
+async def main(args):
+    script = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script) as f:
+            script = json.load(f)
+    server = MockAgentServer(script, args.speed)
+    async with await server.serve(args.host, args.port):
+        logger.info("Mock agent listening on ws://%s:%s", args.host, args.port)
+        try:
+            await asyncio.Future()
+        finally:
+            logger.info("Mock agent stats: %s", server.stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("mock_agent_server")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--script", help="JSON conversation script", type=str, default=None)
+    parser.add_argument("--speed", help="Speed-up factor for script timings", type=float, default=1.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)-8s %(asctime)s %(name)-12s %(message)s")
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,272 @@
+import csv
+import json
+import sqlite3
+import argparse
+import threading
+from itertools import islice
+
+from fuzzy_index import near_matches
+
+ORDER_COLUMNS = (
+    "order_id",
+    "store_location",
+    "vendor_name",
+    "status",
+    "order_date",
+    "delivery_date",
+)
+ADDRESS_COLUMNS = ("line1", "line2", "city", "state", "zip", "country")
+ITEM_COLUMNS = ("product_id", "product_name", "quantity", "unit_price")
+INDEXED_FIELDS = ("vendor_name", "status", "store_location")
+
+# Lookups are case-insensitive like OrderStore's, but NOCASE only folds
+# ASCII. Orders keep their rowid so indexed finds return them in import
+# order; items are clustered by order.
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    store_location TEXT NOT NULL COLLATE NOCASE,
+    vendor_name TEXT NOT NULL COLLATE NOCASE,
+    status TEXT NOT NULL COLLATE NOCASE,
+    order_date TEXT NOT NULL,
+    delivery_date TEXT NOT NULL,
+    {", ".join(f"address_{name} TEXT NOT NULL" for name in ADDRESS_COLUMNS)}
+);
+CREATE TABLE IF NOT EXISTS order_items (
+    order_id TEXT NOT NULL COLLATE NOCASE,
+    position INTEGER NOT NULL,
+    product_id TEXT NOT NULL,
+    product_name TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    unit_price REAL NOT NULL,
+    PRIMARY KEY (order_id, position)
+) WITHOUT ROWID;
+{"".join(f"CREATE INDEX IF NOT EXISTS orders_{field} ON orders({field});" for field in INDEXED_FIELDS)}
+"""
+
+# Statement texts never vary, so each connection prepares them once and
+# reuses them from its statement cache
+_FIELDS = ", ".join([*ORDER_COLUMNS, *(f"address_{name}" for name in ADDRESS_COLUMNS)])
+SELECT_ORDER = f"SELECT {_FIELDS} FROM orders WHERE order_id = ?"
+SELECT_ITEMS = (
+    f"SELECT {', '.join(ITEM_COLUMNS)} FROM order_items WHERE order_id = ? ORDER BY position"
+)
+SELECT_BY = {
+    field: f"SELECT {_FIELDS} FROM orders WHERE {field} = ? ORDER BY rowid"
+    for field in INDEXED_FIELDS
+}
+SELECT_ID = "SELECT order_id FROM orders WHERE order_id = ?"
+SELECT_IDS = "SELECT order_id FROM orders ORDER BY rowid"
+SELECT_EXISTING = (
+    "SELECT order_id FROM orders WHERE order_id IN (SELECT value FROM json_each(?))"
+)
+COUNT_ORDERS = "SELECT count(*) FROM orders"
+INSERT_ORDER = f"INSERT INTO orders ({_FIELDS}) VALUES ({', '.join('?' * 12)})"
+INSERT_ITEM = (
+    f"INSERT INTO order_items (order_id, position, {', '.join(ITEM_COLUMNS)}) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+# Orders are written in batches of this many when importing order dicts
+IMPORT_BATCH = 10000
+
+
+def connect(path, readonly=False):
+    conn = sqlite3.connect(path, check_same_thread=False, cached_statements=64)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if readonly:
+        conn.execute("PRAGMA query_only=1")
+        conn.execute("PRAGMA mmap_size=268435456")
+    return conn
+
+
+def _order_row(order):
+    address = order.get("shipping_address") or {}
+    return (
+        *(str(order[name]) for name in ORDER_COLUMNS),
+        *(address.get(name) or "" for name in ADDRESS_COLUMNS),
+    )
+
+
+def _item_row(order_id, position, item):
+    return (
+        order_id,
+        position,
+        str(item["product_id"]),
+        item["product_name"],
+        int(item["quantity"]),
+        float(item["unit_price"]),
+    )
+
+
+def _replace(path, write):
+    # Swaps the database's contents in one transaction; readers keep seeing
+    # the previous data until it commits
+    conn = connect(path)
+    try:
+        conn.executescript(SCHEMA)
+        with conn:
+            conn.execute("DELETE FROM order_items")
+            conn.execute("DELETE FROM orders")
+            write(conn)
+        count = conn.execute(COUNT_ORDERS).fetchone()[0]
+        conn.execute("PRAGMA optimize")
+        # Fold the WAL back into the main file; its new mtime is what
+        # order_reloader.OrderReloader picks up
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return count
+    finally:
+        conn.close()
+
+
+def import_orders(path, orders):
+    # orders: order dicts shaped like agent_functions.load_orders() returns
+    # (or data/orders.json), consumed in batches so any iterable works
+    def write(conn):
+        orders_iter = iter(orders)
+        while batch := list(islice(orders_iter, IMPORT_BATCH)):
+            conn.executemany(INSERT_ORDER, (_order_row(order) for order in batch))
+            conn.executemany(
+                INSERT_ITEM,
+                (
+                    _item_row(order["order_id"], position, item)
+                    for order in batch
+                    for position, item in enumerate(order.get("items", ()))
+                ),
+            )
+
+    return _replace(path, write)
+
+
+def import_csv(path, orders_path, items_path):
+    # Streams both CSVs straight into the tables; an item's position is its
+    # line in the items file, which keeps each order's items in file order
+    def write(conn):
+        with open(orders_path, newline="") as f:
+            conn.executemany(
+                INSERT_ORDER,
+                (
+                    _order_row(
+                        {
+                            **row,
+                            "shipping_address": {
+                                name: row.get(f"shipping_address_{name}")
+                                for name in ADDRESS_COLUMNS
+                            },
+                        }
+                    )
+                    for row in csv.DictReader(f)
+                ),
+            )
+        with open(items_path, newline="") as f:
+            conn.executemany(
+                INSERT_ITEM,
+                (
+                    _item_row(row["order_id"], line, row)
+                    for line, row in enumerate(csv.DictReader(f))
+                ),
+            )
+
+    return _replace(path, write)
+
+
+def import_json(path, json_path):
+    with open(json_path) as f:
+        return import_orders(path, json.load(f))
+
+
+class OrderDB:
+    # SQLite-backed order store with the same lookups as
+    # agent_functions.OrderStore. Every thread that queries it gets its own
+    # read-only connection, opened on first use and kept for the life of
+    # the store; the database file can be shared by any number of processes.
+    # Near-match lookups for misheard order ids run in the database, so the
+    # ids never have to be loaded into memory.
+    def __init__(self, path, version=0):
+        self.path = path
+        self.version = version
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        # Fail early on a missing or foreign file rather than creating one
+        with open(path, "rb"):
+            pass
+        self._conn().execute(COUNT_ORDERS)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path, readonly=True)
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def __len__(self):
+        return self._conn().execute(COUNT_ORDERS).fetchone()[0]
+
+    def _order(self, conn, row):
+        order = dict(zip(ORDER_COLUMNS, row))
+        order["items"] = [
+            dict(zip(ITEM_COLUMNS, item)) for item in conn.execute(SELECT_ITEMS, (row[0],))
+        ]
+        order["shipping_address"] = dict(zip(ADDRESS_COLUMNS, row[len(ORDER_COLUMNS):]))
+        return order
+
+    def get(self, order_id):
+        conn = self._conn()
+        row = conn.execute(SELECT_ORDER, (order_id,)).fetchone()
+        return self._order(conn, row) if row else None
+
+    def find(self, field, value):
+        if field not in SELECT_BY:
+            raise KeyError(f"Field {field!r} is not indexed")
+        conn = self._conn()
+        rows = conn.execute(SELECT_BY[field], (value,)).fetchall()
+        return [self._order(conn, row) for row in rows]
+
+    def find_by_vendor(self, vendor_name):
+        return self.find("vendor_name", vendor_name)
+
+    def find_by_status(self, status):
+        return self.find("status", status)
+
+    def find_by_location(self, store_location):
+        return self.find("store_location", store_location)
+
+    def ids(self):
+        return (row[0] for row in self._conn().execute(SELECT_IDS))
+
+    def _stored_id(self, order_id):
+        row = self._conn().execute(SELECT_ID, (order_id,)).fetchone()
+        return row[0] if row else None
+
+    def _stored_ids(self, order_ids):
+        rows = self._conn().execute(SELECT_EXISTING, (json.dumps(sorted(order_ids)),))
+        return (row[0] for row in rows)
+
+    def lookup(self, query, limit=3):
+        # All of the query's near misses are checked in one indexed query
+        return near_matches(query, self._stored_id, limit, self._stored_ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("order_db")
+    parser.add_argument("--orders", default="./data/orders.csv")
+    parser.add_argument("--items", default="./data/order_items.csv")
+    parser.add_argument("--json", help="Import this JSON file instead of the CSVs", default=None)
+    parser.add_argument("--out", default="./data/orders.db")
+    args = parser.parse_args()
+
+    if args.json:
+        count = import_json(args.out, args.json)
+    else:
+        count = import_csv(args.out, args.orders, args.items)
+    print(f"Wrote {count} orders to {args.out}")
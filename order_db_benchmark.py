@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+from agent_functions import OrderStore
+from order_db import OrderDB, import_orders
+
+VENDORS = [f"Vendor {index}" for index in range(200)]
+STATUSES = ["processing", "shipped", "delivered", "cancelled"]
+LOCATIONS = [f"Store {index}" for index in range(50)]
+
+
+def synthetic_orders(count):
+    # Orders shaped like load_orders() returns, generated lazily so the
+    # database import never holds them all at once
+    rng = random.Random(count)
+    for index in range(count):
+        order_id = str(10000 + index)
+        yield {
+            "order_id": order_id,
+            "store_location": rng.choice(LOCATIONS),
+            "vendor_name": rng.choice(VENDORS),
+            "status": rng.choice(STATUSES),
+            "order_date": "2025-01-15",
+            "delivery_date": "2025-01-22",
+            "items": [
+                {
+                    "product_id": f"P{rng.randrange(1000)}",
+                    "product_name": "Widget",
+                    "quantity": rng.randrange(1, 5),
+                    "unit_price": 9.99,
+                }
+                for _ in range(rng.randrange(1, 4))
+            ],
+            "shipping_address": {
+                "line1": f"{index} Main St",
+                "line2": "",
+                "city": "Springfield",
+                "state": "IL",
+                "zip": "62701",
+                "country": "US",
+            },
+        }
+
+
+def query_ids(count, lookups):
+    # Mostly hits, with one in ten ids past the end of the data
+    rng = random.Random(lookups)
+    return [str(10000 + rng.randrange(int(count * 1.1))) for _ in range(lookups)]
+
+
+def measure_gets(store, ids):
+    started = time.perf_counter()
+    for order_id in ids:
+        store.get(order_id)
+    elapsed = time.perf_counter() - started
+    return {"lookups_per_s": round(len(ids) / elapsed), "us_per_lookup": round(elapsed / len(ids) * 1e6, 2)}
+
+
+def measure_threads(db, ids, threads):
+    # Each thread queries through its own pooled connection
+    chunks = [ids[index::threads] for index in range(threads)]
+    workers = [threading.Thread(target=measure_gets, args=(db, chunk)) for chunk in chunks]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    return {"threads": threads, "lookups_per_s": round(len(ids) / elapsed)}
+
+
+def bench_size(count, args, workdir):
+    ids = query_ids(count, args.lookups)
+    report = {"orders": count}
+
+    if count <= args.max_memory_orders:
+        started = time.perf_counter()
+        store = OrderStore(synthetic_orders(count))
+        report["memory_build_s"] = round(time.perf_counter() - started, 3)
+        report["memory_get"] = measure_gets(store, ids)
+        del store
+    else:
+        report["memory_get"] = "skipped"
+
+    path = os.path.join(workdir, f"orders-{count}.db")
+    started = time.perf_counter()
+    import_orders(path, synthetic_orders(count))
+    report["db_import_s"] = round(time.perf_counter() - started, 3)
+    report["db_file_mb"] = round(os.path.getsize(path) / 2**20, 1)
+
+    started = time.perf_counter()
+    db = OrderDB(path)
+    report["db_open_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    try:
+        report["db_get"] = measure_gets(db, ids)
+        report["db_get_threaded"] = measure_threads(db, ids, args.threads)
+        started = time.perf_counter()
+        for order_id in ids[: args.lookups // 10]:
+            db.lookup(order_id[::-1])
+        elapsed = time.perf_counter() - started
+        report["db_fuzzy_us_per_lookup"] = round(elapsed / max(args.lookups // 10, 1) * 1e6, 2)
+    finally:
+        db.close()
+        if not args.keep:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    return report
+
+
+def main(args):
+    sizes = [int(size) for size in args.sizes.split(",")]
+    workdir = args.dir or tempfile.mkdtemp(prefix="order_db_benchmark-")
+    reports = []
+    for count in sizes:
+        reports.append(bench_size(count, args, workdir))
+        print(json.dumps(reports[-1]), flush=True)
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("order_db_benchmark")
+    parser.add_argument("--sizes", help="Comma-separated order counts", default="10000,1000000,10000000")
+    parser.add_argument("--lookups", help="Order lookups timed per backend", type=int, default=100000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument(
+        "--max-memory-orders",
+        help="Skip the in-memory store above this many orders",
+        type=int,
+        default=1000000,
+    )
+    parser.add_argument("--dir", help="Where to build the databases (default: a temp dir)", default=None)
+    parser.add_argument("--keep", help="Keep the databases afterwards", action="store_true")
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,68 @@
+import os
+import logging
+import threading
+
+import agent_functions
+
+logger = logging.getLogger(__name__)
+
+
+def _mtimes(paths):
+    mtimes = []
+    for path in paths:
+        try:
+            mtimes.append(os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+class OrderReloader:
+    def __init__(self, paths=None, interval=2.0):
+        self.paths = paths or (
+            agent_functions.ORDERS_CSV,
+            agent_functions.ORDER_ITEMS_CSV,
+            agent_functions.ORDER_SNAPSHOT,
+            *([agent_functions.ORDER_DB] if agent_functions.ORDER_DB else []),
+        )
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._loaded = _mtimes(self.paths)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _watch(self):
+        pending = None
+        while not self._stop.wait(self.interval):
+            mtimes = _mtimes(self.paths)
+            if mtimes == self._loaded:
+                pending = None
+                continue
+            # Only reload once the files have stopped changing for a full
+            # interval, so a half-written export is never picked up.
+            if mtimes != pending:
+                pending = mtimes
+                continue
+            try:
+                store = agent_functions.reload_store()
+                logger.info("Order data reloaded, version %s (%s orders)", store.version, len(store))
+            except Exception as e:
+                logger.error("Order data reload failed: %s", e)
+            self._loaded = mtimes
+            pending = None
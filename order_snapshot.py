@@ -0,0 +1,274 @@
+import argparse
+import csv
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from fuzzy_index import near_matches
+
+# Columnar snapshot layout: a header followed by 8-byte aligned sections.
+# Strings are interned into one UTF-8 blob and referenced by uint32 id, every
+# order/item field is a fixed-width column, and each index is a sorted array
+# of lowercased keys pointing into a postings list of order row numbers.
+MAGIC = b"ORDSNAP1"
+HEADER = struct.Struct("<8sBxxxI")
+SECTION = struct.Struct("<QQ")
+
+ORDER_COLUMNS = (
+    "order_id",
+    "store_location",
+    "vendor_name",
+    "status",
+    "order_date",
+    "delivery_date",
+)
+ADDRESS_COLUMNS = ("line1", "line2", "city", "state", "zip", "country")
+INDEXED_FIELDS = ("order_id", "vendor_name", "status", "store_location")
+
+SECTIONS = (
+    [f"order.{name}" for name in ORDER_COLUMNS]
+    + [f"address.{name}" for name in ADDRESS_COLUMNS]
+    + ["order.item_start", "order.item_count"]
+    + ["item.product_id", "item.product_name", "item.quantity", "item.unit_price"]
+    + ["strings.offsets", "strings.data"]
+    + [
+        f"index.{field}.{part}"
+        for field in INDEXED_FIELDS
+        for part in ("keys", "starts", "counts", "postings")
+    ]
+)
+SECTION_TYPES = {"item.quantity": "i", "item.unit_price": "d", "strings.data": "B"}
+
+_BYTEORDER = {"little": 0, "big": 1}
+
+
+def _column(typecode):
+    column = array(typecode)
+    if typecode in "Ii" and column.itemsize != 4:
+        raise RuntimeError(f"array({typecode!r}) is not 4 bytes on this platform")
+    return column
+
+
+class _StringTable:
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+        self.offsets = _column("I")
+        self.offsets.append(0)
+        self.data = bytearray()
+
+    def intern(self, value):
+        ref = self.ids.get(value)
+        if ref is None:
+            ref = self.ids[value] = len(self.ids)
+            self.values.append(value)
+            self.data += value.encode("utf-8")
+            self.offsets.append(len(self.data))
+        return ref
+
+
+def compile_snapshot(orders_path, items_path, out_path):
+    strings = _StringTable()
+    columns = {name: _column(SECTION_TYPES.get(name, "I")) for name in SECTIONS}
+    rows = {}
+    keys = {field: {} for field in INDEXED_FIELDS}
+
+    with open(orders_path, newline="") as f:
+        for row in csv.DictReader(f):
+            # A repeated id overwrites the earlier row in place, so the last
+            # one wins at the first one's position, as in load_orders()
+            number = rows.setdefault(row["order_id"], len(rows))
+            values = [(f"order.{name}", row[name]) for name in ORDER_COLUMNS]
+            values += [
+                (f"address.{name}", row.get(f"shipping_address_{name}") or "")
+                for name in ADDRESS_COLUMNS
+            ]
+            for name, value in values:
+                column = columns[name]
+                if number < len(column):
+                    column[number] = strings.intern(value)
+                else:
+                    column.append(strings.intern(value))
+
+    # Indexes are built from the final rows so replaced values drop out
+    for field in INDEXED_FIELDS:
+        for number, ref in enumerate(columns[f"order.{field}"]):
+            keys[field].setdefault(strings.values[ref].lower(), []).append(number)
+
+    items = [[] for _ in range(len(rows))]
+    with open(items_path, newline="") as f:
+        for row in csv.DictReader(f):
+            items[rows[row["order_id"]]].append(
+                (
+                    strings.intern(row["product_id"]),
+                    strings.intern(row["product_name"]),
+                    int(row["quantity"]),
+                    float(row["unit_price"]),
+                )
+            )
+
+    for order_items in items:
+        columns["order.item_start"].append(len(columns["item.quantity"]))
+        columns["order.item_count"].append(len(order_items))
+        for product_id, product_name, quantity, unit_price in order_items:
+            columns["item.product_id"].append(product_id)
+            columns["item.product_name"].append(product_name)
+            columns["item.quantity"].append(quantity)
+            columns["item.unit_price"].append(unit_price)
+
+    for field in INDEXED_FIELDS:
+        # Sort by encoded key so lookups can binary search on raw bytes
+        for key in sorted(keys[field], key=lambda k: k.encode("utf-8")):
+            postings = keys[field][key]
+            columns[f"index.{field}.keys"].append(strings.intern(key))
+            columns[f"index.{field}.starts"].append(len(columns[f"index.{field}.postings"]))
+            columns[f"index.{field}.counts"].append(len(postings))
+            columns[f"index.{field}.postings"].extend(postings)
+
+    columns["strings.offsets"] = strings.offsets
+    columns["strings.data"] = strings.data
+
+    payloads = [memoryview(columns[name]).cast("B") for name in SECTIONS]
+    offset = HEADER.size + SECTION.size * len(SECTIONS)
+    directory = []
+    for payload in payloads:
+        offset += -offset % 8
+        directory.append((offset, len(payload)))
+        offset += len(payload)
+
+    # Running agents have the old snapshot mapped; rewriting it in place would
+    # pull the pages out from under them. The new file is written alongside
+    # and renamed over it, so they keep the old inode until they reload.
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(out_path)), suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, _BYTEORDER[sys.byteorder], len(SECTIONS)))
+            for entry in directory:
+                f.write(SECTION.pack(*entry))
+            for (start, _), payload in zip(directory, payloads):
+                f.write(b"\x00" * (start - f.tell()))
+                f.write(payload)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(rows)
+
+
+class OrderSnapshot:
+    def __init__(self, path, version=0):
+        self.path = path
+        self.version = version
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, byteorder, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or count != len(SECTIONS):
+            raise ValueError(f"{path} is not an order snapshot")
+        if byteorder != _BYTEORDER[sys.byteorder]:
+            raise ValueError(f"{path} was compiled on a machine with different byte order")
+
+        self._view = memoryview(self._mm)
+        self._sections = {}
+        for i, name in enumerate(SECTIONS):
+            start, length = SECTION.unpack_from(self._mm, HEADER.size + i * SECTION.size)
+            section = self._view[start:start + length]
+            self._sections[name] = section.cast(SECTION_TYPES.get(name, "I"))
+        self._offsets = self._sections["strings.offsets"]
+        self._data = self._sections["strings.data"]
+
+    def __len__(self):
+        return len(self._sections["order.order_id"])
+
+    def close(self):
+        # Views into the mapping must be released before it can be unmapped
+        for section in self._sections.values():
+            section.release()
+        self._view.release()
+        self._sections = {}
+        self._offsets = self._data = None
+        self._mm.close()
+
+    def _bytes(self, ref):
+        return self._data[self._offsets[ref]:self._offsets[ref + 1]].tobytes()
+
+    def _string(self, ref):
+        return self._bytes(ref).decode("utf-8")
+
+    def _postings(self, field, key):
+        keys = self._sections[f"index.{field}.keys"]
+        target = key.lower().encode("utf-8")
+        lo, hi = 0, len(keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._bytes(keys[mid]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(keys) or self._bytes(keys[lo]) != target:
+            return []
+        start = self._sections[f"index.{field}.starts"][lo]
+        count = self._sections[f"index.{field}.counts"][lo]
+        return self._sections[f"index.{field}.postings"][start:start + count].tolist()
+
+    def _order(self, row):
+        s = self._sections
+        order = {name: self._string(s[f"order.{name}"][row]) for name in ORDER_COLUMNS}
+        start = s["order.item_start"][row]
+        order["items"] = [
+            {
+                "product_id": self._string(s["item.product_id"][i]),
+                "product_name": self._string(s["item.product_name"][i]),
+                "quantity": s["item.quantity"][i],
+                "unit_price": s["item.unit_price"][i],
+            }
+            for i in range(start, start + s["order.item_count"][row])
+        ]
+        order["shipping_address"] = {
+            name: self._string(s[f"address.{name}"][row]) for name in ADDRESS_COLUMNS
+        }
+        return order
+
+    def get(self, order_id):
+        rows = self._postings("order_id", order_id)
+        return self._order(rows[0]) if rows else None
+
+    def find(self, field, value):
+        if field not in INDEXED_FIELDS or field == "order_id":
+            raise KeyError(f"Field {field!r} is not indexed")
+        return [self._order(row) for row in self._postings(field, value)]
+
+    def find_by_vendor(self, vendor_name):
+        return self.find("vendor_name", vendor_name)
+
+    def find_by_status(self, status):
+        return self.find("status", status)
+
+    def find_by_location(self, store_location):
+        return self.find("store_location", store_location)
+
+    def ids(self):
+        return (self._string(ref) for ref in self._sections["order.order_id"])
+
+    def _stored_id(self, order_id):
+        rows = self._postings("order_id", order_id)
+        return self._string(self._sections["order.order_id"][rows[0]]) if rows else None
+
+    def lookup(self, query, limit=3):
+        # Each near miss of the query is one binary search of the id index
+        return near_matches(query, self._stored_id, limit)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("order_snapshot")
+    parser.add_argument("--orders", default="./data/orders.csv")
+    parser.add_argument("--items", default="./data/order_items.csv")
+    parser.add_argument("--out", default="./data/orders.snapshot")
+    args = parser.parse_args()
+
+    count = compile_snapshot(args.orders, args.items, args.out)
+    print(f"Wrote {count} orders to {args.out}")
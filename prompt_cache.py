@@ -0,0 +1,145 @@
+import os
+import copy
+import json
+import wave
+import hashlib
+import logging
+import tempfile
+import urllib.parse
+import urllib.request
+
+import numpy as np
+
+from audio_processing import Resampler
+from connection_pool import agent_headers
+
+logger = logging.getLogger(__name__)
+
+# Prompts are optional; files that don't exist are skipped. A recorded
+# greeting.wav replaces the agent's; without one, add_greeting() renders the
+# agent's own. The filler is a short chime.
+DEFAULT_PROMPTS = {
+    "greeting": "./data/prompts/greeting.wav",
+    "one_moment": "./data/prompts/one_moment.wav",
+}
+# A function has to run this long before the "one moment" filler plays
+FILLER_DELAY = 0.7
+# Agent audio queues behind a prompt, so longer ones are refused
+MAX_PROMPT_SECONDS = 5.0
+# Rendered greetings are kept here, one file per text, voice and rate
+PROMPT_CACHE_DIR = "./data/prompts/cache"
+SPEAK_URL = os.environ.get("DEEPGRAM_SPEAK_URL", "https://api.deepgram.com/v1/speak")
+
+
+def render_greeting(settings, sample_rate, cache_dir=PROMPT_CACHE_DIR, url=SPEAK_URL, headers=None):
+    # Renders settings' agent greeting with its Deepgram speak voice, once;
+    # later calls return the cached WAV. None if there is nothing to render.
+    agent = settings.get("agent", {})
+    text = agent.get("greeting")
+    provider = agent.get("speak", {}).get("provider", {})
+    if not text or provider.get("type") != "deepgram":
+        return None
+    model = provider.get("model")
+    digest = hashlib.sha1(f"{model}|{sample_rate}|{text}".encode()).hexdigest()[:16]
+    path = os.path.join(cache_dir, f"greeting-{digest}.wav")
+    if os.path.exists(path):
+        return path
+
+    query = urllib.parse.urlencode(
+        {"model": model, "encoding": "linear16", "sample_rate": sample_rate, "container": "none"}
+    )
+    request = urllib.request.Request(
+        f"{url}?{query}",
+        data=json.dumps({"text": text}).encode(),
+        headers={**(agent_headers() if headers is None else headers), "Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=15) as response:
+        pcm = response.read()
+    if not pcm:
+        raise ValueError("The speak API returned no audio")
+
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f, wave.open(f, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(sample_rate)
+            w.writeframes(pcm[:len(pcm) & ~1])
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+class PromptCache:
+    # Pre-rendered prompts held in memory as linear16 at the speaker's
+    # sample rate, so playing one is a single speaker.play() with no file
+    # access or resampling on the call. Load once and share between calls.
+    def __init__(self, sample_rate, prompts=None, max_seconds=MAX_PROMPT_SECONDS):
+        self.sample_rate = sample_rate
+        self.max_seconds = max_seconds
+        self._audio = {}
+        for name, path in (DEFAULT_PROMPTS if prompts is None else prompts).items():
+            try:
+                self.load(name, path)
+            except FileNotFoundError:
+                logger.debug("No %s prompt at %s", name, path)
+            except ValueError as e:
+                logger.warning("Skipping %s prompt: %s", name, e)
+
+    def __contains__(self, name):
+        return name in self._audio
+
+    def __len__(self):
+        return len(self._audio)
+
+    def load(self, name, path, max_seconds=None):
+        with wave.open(path, "rb") as f:
+            if f.getnchannels() != 1 or f.getsampwidth() != 2:
+                raise ValueError(f"{path} must be mono 16-bit PCM")
+            rate = f.getframerate()
+            pcm = f.readframes(f.getnframes())
+        self.add(name, pcm, rate, max_seconds)
+
+    def add(self, name, pcm, rate, max_seconds=None):
+        max_seconds = self.max_seconds if max_seconds is None else max_seconds
+        if len(pcm) > max_seconds * rate * 2:
+            raise ValueError(f"{name} prompt is longer than {max_seconds} s")
+        samples = Resampler(rate, self.sample_rate).process(pcm)
+        self._audio[name] = memoryview(np.ascontiguousarray(samples, dtype="<i2")).cast("B")
+
+    def add_greeting(self, settings, cache_dir=PROMPT_CACHE_DIR, url=SPEAK_URL, headers=None):
+        # Without a recorded greeting, plays the agent's own: rendered once
+        # in its configured voice, then read from the cache on later starts.
+        # It is what the agent would say anyway, so it isn't length-capped.
+        if "greeting" in self._audio:
+            return True
+        if headers is None and not os.environ.get("DEEPGRAM_API_KEY"):
+            logger.debug("No DEEPGRAM_API_KEY to render the greeting with")
+            return False
+        try:
+            path = render_greeting(settings, self.sample_rate, cache_dir, url, headers)
+            if path is None:
+                return False
+            self.load("greeting", path, max_seconds=float("inf"))
+        except (OSError, ValueError, wave.Error) as e:
+            logger.warning("Could not render the agent greeting, the agent will speak it: %s", e)
+            return False
+        return True
+
+    def get(self, name):
+        return self._audio.get(name)
+
+    def duration(self, name):
+        audio = self._audio.get(name)
+        return len(audio) / (self.sample_rate * 2) if audio is not None else 0.0
+
+    def settings_for(self, settings):
+        # With a local greeting the agent mustn't speak its own as well
+        if "greeting" not in self._audio or "greeting" not in settings.get("agent", {}):
+            return settings
+        settings = copy.deepcopy(settings)
+        del settings["agent"]["greeting"]
+        return settings
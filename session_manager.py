@@ -0,0 +1,218 @@
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+
+from agent_config import AGENT_SETTINGS, VAD_SETTINGS, merge_settings
+from agent_functions import FUNCTION_MAP
+from connection_pool import ConnectionPool
+from function_executor import new_pool
+from main import start_stream
+from speaker import Speaker
+
+logger = logging.getLogger(__name__)
+
+
+class Session:
+    # One agent call fed by an audio_io source, which the session closes
+    # when the call ends. state is the dict start_stream reads and writes
+    # (endstream, goodbye_triggered, and the stats it leaves behind when the
+    # call ends); nothing in it is shared with other sessions.
+    def __init__(
+        self,
+        session_id,
+        source,
+        settings,
+        vad,
+        speaker_factory,
+        function_map,
+        trace_path=None,
+        events=None,
+        handlers=None,
+        record_path=None,
+    ):
+        self.id = session_id
+        self.source = source
+        self.settings = settings
+        self.vad = vad
+        self.speaker_factory = speaker_factory
+        self.function_map = function_map
+        self.trace_path = trace_path
+        # Stereo WAV the call is recorded to; see call_recorder.py
+        self.record_path = record_path
+        # Optional event_bus.EventBus the call publishes transcript and
+        # status events to
+        self.events = events
+        # Extra agent message handlers, {msg_type: handler}; see dispatch.py
+        self.handlers = handlers
+        self.state = {"endstream": False, "agent_ready": False, "goodbye_triggered": False}
+        self.status = "queued"
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.ended_at = None
+        self.task = None
+
+    def hang_up(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    def metrics(self):
+        duration = None
+        if self.started_at is not None:
+            duration = round((self.ended_at or time.time()) - self.started_at, 3)
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "queued_s": round((self.started_at or time.time()) - self.created_at, 3),
+            "duration_s": duration,
+            "completed": self.state.get("goodbye_triggered", False),
+            "setup_ms": self.state.get("setup_ms"),
+            "mic": self.state.get("mic_stats", {}),
+            "speaker": self.state.get("speaker_stats", {}),
+            "turns": self.state.get("turn_summary", {}),
+            "connection": self.state.get("connection_stats", {}),
+            "recording": self.state.get("recording_stats", {}),
+        }
+
+
+class SessionManager:
+    # Runs many independent agent sessions on one event loop. At most
+    # max_sessions calls are connected at once (later ones wait their turn),
+    # function lookups for every session share one bounded thread pool, and
+    # only the last `history` finished sessions are kept for reporting. With
+    # pool_size > 0, that many configured agent connections are kept warm
+    # for new calls. A shared prompt_cache.PromptCache plays its greeting
+    # locally at the start of every call.
+    def __init__(
+        self,
+        uri,
+        max_sessions=200,
+        settings=AGENT_SETTINGS,
+        vad=VAD_SETTINGS,
+        speaker_factory=Speaker,
+        function_map=FUNCTION_MAP,
+        max_workers=8,
+        history=1000,
+        pool_size=0,
+        prompts=None,
+    ):
+        self.uri = uri
+        self.max_sessions = max_sessions
+        self.prompts = prompts
+        self.settings = prompts.settings_for(settings) if prompts is not None else settings
+        self.vad = vad
+        self.speaker_factory = speaker_factory
+        self.function_map = function_map
+        self.sessions = {}
+        self.finished = deque(maxlen=history)
+        self._slots = asyncio.Semaphore(max_sessions)
+        self._pool = new_pool(max_workers)
+        self.connections = ConnectionPool(uri, self.settings, pool_size) if pool_size else None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def start(
+        self,
+        source,
+        session_id=None,
+        overrides=None,
+        vad=None,
+        speaker_factory=None,
+        function_map=None,
+        trace_path=None,
+        events=None,
+        handlers=None,
+        record_path=None,
+    ):
+        session = Session(
+            session_id or str(uuid.uuid4()),
+            source,
+            merge_settings(overrides, self.settings) if overrides else self.settings,
+            self.vad if vad is None else vad,
+            speaker_factory or self.speaker_factory,
+            function_map or self.function_map,
+            trace_path,
+            events,
+            handlers,
+            record_path,
+        )
+        if session.id in self.sessions:
+            raise ValueError(f"Session {session.id} is already running")
+        if self.connections is not None:
+            self.connections.start()
+        self.sessions[session.id] = session
+        session.task = asyncio.create_task(self._run(session))
+        return session
+
+    def get(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = next((s for s in self.finished if s.id == session_id), None)
+        return session
+
+    async def _run(self, session):
+        try:
+            async with self._slots:
+                session.status = "running"
+                session.started_at = time.time()
+                await start_stream(
+                    session.source,
+                    self.uri,
+                    session.state,
+                    session.settings,
+                    session.vad,
+                    session.trace_path,
+                    session.speaker_factory,
+                    session.function_map,
+                    self._pool,
+                    self.connections,
+                    session.events,
+                    session.handlers,
+                    session.record_path,
+                    self.prompts,
+                )
+            session.status = "finished"
+        except asyncio.CancelledError:
+            session.status = "cancelled"
+        except Exception as e:
+            session.status = "failed"
+            session.error = str(e)
+            logger.error("Session %s failed: %s", session.id, e)
+        finally:
+            session.source.close()
+            session.ended_at = time.time()
+            self.sessions.pop(session.id, None)
+            self.finished.append(session)
+        return session
+
+    async def wait(self):
+        tasks = [s.task for s in self.sessions.values()]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def close(self):
+        for session in list(self.sessions.values()):
+            session.hang_up()
+        await self.wait()
+        if self.connections is not None:
+            await self.connections.close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        counts = {}
+        for session in [*self.sessions.values(), *self.finished]:
+            counts[session.status] = counts.get(session.status, 0) + 1
+        stats = {"active": len(self.sessions), "max_sessions": self.max_sessions, **counts}
+        if self.connections is not None:
+            stats["connection_pool"] = self.connections.stats()
+        return stats
@@ -1,66 +1,253 @@
-import janus
 import threading
-import pyaudio
-import queue
 import time
 import asyncio
 import wave
 import os
 
+try:
+    import pyaudio
+except ImportError:
+    # Only needed once a Speaker is opened; headless sessions use audio_io sinks
+    pyaudio = None
 
-def _play(audio_out, stream, stop):
-    while not stop.is_set():
-        try:
-            data = audio_out.sync_q.get(True, 0.05)
-            stream.write(data)
-        except queue.Empty:
-            pass
+
+class RingBuffer:
+    # Fixed-size byte ring written by the event loop and read by the playback
+    # thread. All storage is allocated up front; when a write does not fit,
+    # the oldest audio is dropped and counted as an overrun.
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._size = 0
+        self.overruns = 0
+        self.dropped_bytes = 0
+
+    def __len__(self):
+        return self._size
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+
+    def write(self, data):
+        data = memoryview(data).cast("B")
+        if len(data) > self.capacity:
+            self.dropped_bytes += len(data) - self.capacity
+            data = data[len(data) - self.capacity:]
+        overflow = self._size + len(data) - self.capacity
+        if overflow > 0:
+            self.overruns += 1
+            self.dropped_bytes += overflow
+            self._start = (self._start + overflow) % self.capacity
+            self._size -= overflow
+        end = (self._start + self._size) % self.capacity
+        first = min(len(data), self.capacity - end)
+        self._view[end:end + first] = data[:first]
+        self._view[:len(data) - first] = data[first:]
+        self._size += len(data)
+
+    def read_into(self, out, n):
+        n = min(n, self._size, len(out))
+        first = min(n, self.capacity - self._start)
+        out[:first] = self._view[self._start:self._start + first]
+        out[first:n] = self._view[:n - first]
+        self._start = (self._start + n) % self.capacity
+        self._size -= n
+        return n
+
+
+def _discard_output(stream):
+    # PyAudio's Stream only exposes stop_stream(), which waits for queued
+    # device buffers to play out; abort through the C module to drop them.
+    handle = getattr(stream, "_stream", None)
+    pa = getattr(pyaudio, "pa", None)
+    if handle is not None and hasattr(pa, "abort_stream"):
+        pa.abort_stream(handle)
+        pa.start_stream(handle)
+    else:
+        stream.stop_stream()
+        stream.start_stream()
+
+
+def _play(speaker):
+    ring = speaker._ring
+    cond = speaker._cond
+    out = bytearray(speaker.chunk_bytes)
+    # PyAudio only accepts read-only buffers, so write through a read-only
+    # view of the preallocated chunk instead of copying it into bytes
+    out_view = memoryview(out).toreadonly()
+
+    while True:
+        with cond:
+            if not speaker._playing:
+                # Build up the target depth before starting a burst, unless
+                # the agent has already finished this utterance
+                while (
+                    not speaker._stop.is_set()
+                    and speaker._flush_at is None
+                    and len(ring) < speaker.target_bytes
+                ):
+                    if len(ring) and speaker._draining:
+                        break
+                    if not cond.wait(None if not len(ring) else speaker.target_depth):
+                        break
+            elif len(ring) < speaker.chunk_bytes and not speaker._draining:
+                cond.wait(speaker.chunk_duration)
+            if speaker._stop.is_set():
+                return
+
+            flush_at, speaker._flush_at = speaker._flush_at, None
+            n = 0
+            if flush_at is None:
+                n = ring.read_into(out, speaker.chunk_bytes)
+                if n < speaker.chunk_bytes:
+                    if not speaker._draining and (speaker._playing or n):
+                        speaker.underruns += 1
+                    speaker._playing = False
+                    if not len(ring):
+                        speaker._draining = False
+                else:
+                    speaker._playing = True
+
+        if flush_at is not None:
+            # Barge-in: the in-flight write was at most one chunk, now drop
+            # whatever the device still has queued
+            _discard_output(speaker._stream)
+            speaker._record_barge_in(time.perf_counter() - flush_at)
+        elif n:
+            speaker._stream.write(out_view[:n])
 
 
 class Speaker:
-    def __init__(self, sample_rate):
-        self._queue = None
+    def __init__(
+        self,
+        sample_rate,
+        target_depth=0.06,
+        chunk_duration=0.02,
+        capacity=60.0,
+        barge_in=True,
+        audio=None,
+    ):
+        # audio: a shared pyaudio.PyAudio(); by default the speaker creates
+        # and terminates its own
+        self._audio = audio
+        self._owns_audio = audio is None
+        self._ring = None
+        self._cond = None
         self._stream = None
         self._thread = None
         self._stop = None
+        self._draining = False
+        self._playing = False
+        self._flush_at = None
         self.sample_rate = sample_rate
+        self.target_depth = target_depth
+        # In barge-in mode output goes out in 10 ms slices so an interrupted
+        # write finishes almost immediately
+        self.chunk_duration = min(chunk_duration, 0.01) if barge_in else chunk_duration
+        self.capacity = capacity
+        self.barge_in = barge_in
+        bytes_per_second = sample_rate * 2
+        self.chunk_bytes = int(bytes_per_second * self.chunk_duration) & ~1
+        self.target_bytes = int(bytes_per_second * target_depth) & ~1
+        self.underruns = 0
+        self.barge_ins = 0
+        self.barge_in_last_ms = 0.0
+        self.barge_in_max_ms = 0.0
+        self._barge_in_total_ms = 0.0
 
     def __enter__(self):
-        audio = pyaudio.PyAudio()
-        self._stream = audio.open(
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        if pyaudio is None:
+            raise RuntimeError("PyAudio is not installed; use an audio_io sink instead")
+        if self._audio is None:
+            self._audio = pyaudio.PyAudio()
+        self._stream = self._audio.open(
             format=pyaudio.paInt16,
             channels=1,
             rate=self.sample_rate,
             input=False,
             output=True,
+            frames_per_buffer=self.chunk_bytes // 2,
         )
-        self._queue = janus.Queue()
+        self._ring = RingBuffer(int(self.sample_rate * 2 * self.capacity) & ~1)
+        self._cond = threading.Condition()
         self._stop = threading.Event()
-        self._thread = threading.Thread(
-            target=_play, args=(self._queue, self._stream, self._stop), daemon=True
-        )
+        self._thread = threading.Thread(target=_play, args=(self,), daemon=True)
         self._thread.start()
         return self
 
-    def __exit__(self, exc_type, exc_value, traceback):
-        self._stop.set()
+    def close(self):
+        with self._cond:
+            self._stop.set()
+            self._cond.notify()
         self._thread.join()
         self._stream.close()
         self._stream = None
-        self._queue = None
+        if self._owns_audio:
+            self._audio.terminate()
+            self._audio = None
+        self._ring = None
+        self._cond = None
         self._thread = None
         self._stop = None
 
     async def play(self, data):
-        return await self._queue.async_q.put(data)
-
-    def stop(self):
-        if self._queue and self._queue.async_q:
-            while not self._queue.async_q.empty():
-                try:
-                    self._queue.async_q.get_nowait()
-                except janus.QueueEmpty:
-                    break
+        with self._cond:
+            self._ring.write(data)
+            self._cond.notify()
+
+    def finish(self):
+        # The agent finished speaking: play out the tail without waiting for
+        # the target depth, and don't count the end as an underrun
+        if self._cond:
+            with self._cond:
+                self._draining = True
+                self._cond.notify()
+
+    def stop(self, received_at=None):
+        # Barge-in: drop everything queued and, in barge-in mode, have the
+        # playback thread cut the device off after its current slice.
+        # received_at (time.perf_counter()) is when the triggering event
+        # arrived and defaults to now.
+        if self._cond:
+            with self._cond:
+                audible = self._playing or len(self._ring) > 0
+                self._ring.clear()
+                self._draining = False
+                self._playing = False
+                if self.barge_in and audible:
+                    self._flush_at = received_at or time.perf_counter()
+                    self._cond.notify()
+
+    def _record_barge_in(self, seconds):
+        ms = seconds * 1000
+        self.barge_ins += 1
+        self.barge_in_last_ms = ms
+        self.barge_in_max_ms = max(self.barge_in_max_ms, ms)
+        self._barge_in_total_ms += ms
+
+    def stats(self):
+        ring = self._ring
+        return {
+            "underruns": self.underruns,
+            "overruns": ring.overruns if ring else 0,
+            "dropped_bytes": ring.dropped_bytes if ring else 0,
+            "buffered_ms": int(len(ring) * 1000 / (self.sample_rate * 2)) if ring else 0,
+            "barge_ins": self.barge_ins,
+            "barge_in_last_ms": round(self.barge_in_last_ms, 1),
+            "barge_in_max_ms": round(self.barge_in_max_ms, 1),
+            "barge_in_mean_ms": round(self._barge_in_total_ms / self.barge_ins, 1)
+            if self.barge_ins
+            else 0.0,
+        }
 
 
 if __name__ == "__main__":
@@ -0,0 +1,213 @@
+import re
+
+# Token table for spoken order ids. Every word maps to (kind, value); the
+# tokenizer regex below is compiled once at import so parsing a phrase is a
+# single scan plus dict lookups.
+DIGIT, TEEN, TENS, MAGNITUDE, REPEAT, FILLER = range(6)
+
+WORDS = {
+    "zero": (DIGIT, 0),
+    "oh": (DIGIT, 0),
+    "o": (DIGIT, 0),
+    "one": (DIGIT, 1),
+    "two": (DIGIT, 2),
+    "three": (DIGIT, 3),
+    "four": (DIGIT, 4),
+    "five": (DIGIT, 5),
+    "six": (DIGIT, 6),
+    "seven": (DIGIT, 7),
+    "eight": (DIGIT, 8),
+    "nine": (DIGIT, 9),
+    "ten": (TEEN, 10),
+    "eleven": (TEEN, 11),
+    "twelve": (TEEN, 12),
+    "thirteen": (TEEN, 13),
+    "fourteen": (TEEN, 14),
+    "fifteen": (TEEN, 15),
+    "sixteen": (TEEN, 16),
+    "seventeen": (TEEN, 17),
+    "eighteen": (TEEN, 18),
+    "nineteen": (TEEN, 19),
+    "twenty": (TENS, 20),
+    "thirty": (TENS, 30),
+    "forty": (TENS, 40),
+    "fifty": (TENS, 50),
+    "sixty": (TENS, 60),
+    "seventy": (TENS, 70),
+    "eighty": (TENS, 80),
+    "ninety": (TENS, 90),
+    "hundred": (MAGNITUDE, 100),
+    "thousand": (MAGNITUDE, 1000),
+    "million": (MAGNITUDE, 1000000),
+    "double": (REPEAT, 2),
+    "triple": (REPEAT, 3),
+    "order": (FILLER, None),
+    "number": (FILLER, None),
+    "id": (FILLER, None),
+    "no": (FILLER, None),
+    "and": (FILLER, None),
+}
+
+_TOKEN = re.compile(r"\d+|[a-z]+|[^\sa-z\d#.,-]")
+_NUMBER_WORDS = (DIGIT, TEEN, TENS, MAGNITUDE)
+_UNITS = frozenset("123456789")
+
+
+def _tokenize(text):
+    tokens = []
+    for word in _TOKEN.findall(text.lower()):
+        if word.isdigit():
+            tokens.append((DIGIT, word))
+        elif word in WORDS:
+            kind, value = WORDS[word]
+            if kind != FILLER:
+                tokens.append((kind, value))
+        else:
+            return None
+    return tokens
+
+
+def _small(tokens, i):
+    # 1-99 as spoken before a magnitude: "four", "twelve", "fifty", "fifty one"
+    if i == len(tokens):
+        return None
+    kind, value = tokens[i]
+    if kind == DIGIT and str(value) in _UNITS:
+        return int(value), i + 1
+    if kind == TEEN:
+        return value, i + 1
+    if kind == TENS:
+        if i + 1 < len(tokens) and tokens[i + 1][0] == DIGIT and str(tokens[i + 1][1]) in _UNITS:
+            return value + int(tokens[i + 1][1]), i + 2
+        return value, i + 1
+    return None
+
+
+def _is_magnitude(tokens, i, value):
+    return i < len(tokens) and tokens[i] == (MAGNITUDE, value)
+
+
+def _cardinal(tokens, i):
+    # The well-formed cardinal starting at tokens[i], as (value, end), if it
+    # has a magnitude: "ten thousand four hundred fifty one" -> 10451
+    total = 0
+    scale = None
+    while True:
+        parsed = _small(tokens, i)
+        if parsed is None:
+            break
+        group, end = parsed
+        if _is_magnitude(tokens, end, 100):
+            group *= 100
+            end += 1
+            parsed = _small(tokens, end)
+            if parsed is not None:
+                group += parsed[0]
+                end = parsed[1]
+        if end < len(tokens) and tokens[end][0] == MAGNITUDE and tokens[end][1] > 100:
+            magnitude = tokens[end][1]
+            if scale is not None and magnitude >= scale:
+                break
+            total += group * magnitude
+            scale = magnitude
+            i = end + 1
+            continue
+        if group >= 100 or scale is not None:
+            return total + group, end
+        break
+    return (total, i) if scale is not None else None
+
+
+def _sum(tokens):
+    # Last resort for runs no cardinal can be read from, e.g. "hundred"
+    total = current = 0
+    for kind, value in tokens:
+        if kind == MAGNITUDE:
+            if value == 100:
+                current = max(current, 1) * value
+            else:
+                total += max(current, 1) * value
+                current = 0
+        else:
+            current += int(value)
+    return str(total + current)
+
+
+def _mixed(tokens):
+    # Number words around a cardinal are read digit by digit:
+    # "ten four hundred fifty one" -> "10" + "451"
+    out = []
+    i = 0
+    while i < len(tokens):
+        start, parsed = i, None
+        while start < len(tokens):
+            parsed = _cardinal(tokens, start)
+            if parsed is not None:
+                break
+            start += 1
+        if parsed is None:
+            if any(kind == MAGNITUDE for kind, _ in tokens[i:]):
+                out.append(_sum(tokens[i:]))
+            else:
+                out.append(_digits(tokens[i:]))
+            break
+        value, end = parsed
+        if start > i:
+            out.append(_digits(tokens[i:start]))
+        out.append(str(value))
+        i = end
+    return "".join(out)
+
+
+def _digits(tokens):
+    # Digit-by-digit reading: "one oh four fifty one" -> 10451
+    out = []
+    i = 0
+    while i < len(tokens):
+        kind, value = tokens[i]
+        if kind == REPEAT:
+            if i + 1 == len(tokens) or tokens[i + 1][0] != DIGIT:
+                return None
+            out.append(str(tokens[i + 1][1]) * value)
+            i += 2
+            continue
+        if kind == TENS and i + 1 < len(tokens):
+            next_kind, next_value = tokens[i + 1]
+            if next_kind == DIGIT and str(next_value) in _UNITS:
+                out.append(str(value + int(next_value)))
+                i += 2
+                continue
+        out.append(str(value))
+        i += 1
+    return "".join(out)
+
+
+def parse_spoken_number(text):
+    # Returns the digit string spoken in text, or None if it is not a number
+    tokens = _tokenize(text)
+    if not tokens:
+        return None
+
+    # Within runs of number words that contain "hundred"/"thousand"/...,
+    # well-formed cardinals are read as such; everything else is read digit
+    # by digit.
+    out = []
+    start = 0
+    while start < len(tokens):
+        end = start
+        while end < len(tokens) and tokens[end][0] in _NUMBER_WORDS:
+            end += 1
+        run = tokens[start:end]
+        if any(kind == MAGNITUDE for kind, _ in run):
+            out.append(_mixed(run))
+            start = end
+            continue
+        if end == start:
+            end = start + 2 if tokens[start][0] == REPEAT else start + 1
+            run = tokens[start:end]
+        digits = _digits(run)
+        if digits is None:
+            return None
+        out.append(digits)
+        start = end
+    return "".join(out)
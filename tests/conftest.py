@@ -0,0 +1,80 @@
+import time
+import wave
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import speaker
+
+SCRIPT = {
+    "greeting_seconds": 0.1,
+    "turns": [
+        {
+            "user": "Where is order 10451?",
+            "functions": [{"name": "get_order_status", "arguments": {"order_id": "10451"}}],
+            "after_audio": 0.05,
+            "agent_audio_seconds": 0.1,
+        },
+        {
+            "user": "Bye.",
+            "functions": [{"name": "end_story", "arguments": {}}],
+            "after_audio": 0.05,
+            "agent_audio_seconds": 0.1,
+        },
+    ],
+}
+
+
+def write_wav(path, samples, rate=16000):
+    # Mono 16-bit, the shape every source and prompt expects
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(np.asarray(samples, dtype=np.int16).tobytes())
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+class FakeStream:
+    # Records what the playback thread writes, at the device's real pace
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.writes = []
+        self.discards = 0
+
+    def write(self, data):
+        self.writes.append(bytes(data))
+        time.sleep(len(data) / (self.sample_rate * 2))
+
+    def stop_stream(self):
+        self.discards += 1
+
+    def start_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeAudio:
+    def __init__(self):
+        self.stream = None
+
+    def open(self, rate, **kwargs):
+        self.stream = FakeStream(rate)
+        return self.stream
+
+    def terminate(self):
+        pass
+
+
+@pytest.fixture
+def fake_pyaudio(monkeypatch):
+    monkeypatch.setattr(speaker, "pyaudio", SimpleNamespace(paInt16=8))
@@ -0,0 +1,13 @@
+from agent_config import AGENT_SETTINGS, merge_settings
+
+
+def test_merge_settings_overrides_nested_keys_without_touching_base():
+    settings = merge_settings(
+        {"audio": {"input": {"sample_rate": 8000}}, "agent": {"listen": {"provider": {"model": "nova-2"}}}}
+    )
+    assert settings["audio"]["input"] == {**AGENT_SETTINGS["audio"]["input"], "sample_rate": 8000}
+    assert settings["audio"]["output"] == AGENT_SETTINGS["audio"]["output"]
+    assert settings["agent"]["listen"]["provider"] == {"model": "nova-2", "type": "deepgram"}
+    assert settings["agent"]["think"] == AGENT_SETTINGS["agent"]["think"]
+    assert AGENT_SETTINGS["audio"]["input"]["sample_rate"] != 8000
+    assert AGENT_SETTINGS["agent"]["listen"]["provider"]["model"] == "nova-3"
@@ -1,4 +1,5 @@
 import pytest
+import agent_functions
 from agent_functions import (
     normalize_order_id,
     get_order_status,
@@ -6,6 +7,9 @@ from agent_functions import (
     get_delivery_address,
     get_vendor_name,
     get_delivery_date,
+    get_order_summary,
+    OrderStore,
+    STORE,
 )
 
 def test_normalize_order_id_numeric():
@@ -34,3 +38,92 @@ def test_get_vendor_name():
 def test_get_delivery_date():
     assert "2025-06-25" in get_delivery_date("one zero four five one")
     assert "2025-06-28" in get_delivery_date("one zero one two three")
+
+def test_order_store_lookup_is_case_insensitive():
+    store = OrderStore([{**STORE.get("10451"), "order_id": "AB-10451"}])
+    assert store.get("ab-10451")["order_id"] == "AB-10451"
+    assert store.get("10451") is None
+
+def test_order_store_secondary_indexes():
+    assert [o["order_id"] for o in STORE.find_by_vendor("tech supplies co.")] == ["10451"]
+    assert [o["order_id"] for o in STORE.find_by_status("PROCESSING")] == ["10123"]
+    assert [o["order_id"] for o in STORE.find_by_location("Columbus East Side Store")] == ["10123"]
+    assert STORE.find_by_status("Cancelled") == []
+
+def test_order_store_apply_is_copy_on_write():
+    old = OrderStore([STORE.get("10451"), STORE.get("10123")])
+    cancelled = {**old.get("10451"), "status": "Cancelled"}
+    new = old.apply(upserts=[cancelled], removed=["10123"])
+
+    assert new.version == old.version + 1
+    assert new.get("10451")["status"] == "Cancelled"
+    assert new.get("10123") is None
+    assert [o["order_id"] for o in new.find_by_status("cancelled")] == ["10451"]
+    assert new.find_by_status("shipped") == []
+    # The previous store is left untouched for readers still holding it
+    assert old.get("10451")["status"] == "Shipped"
+    assert [o["order_id"] for o in old.find_by_status("processing")] == ["10123"]
+
+def test_reload_store_applies_changed_rows(tmp_path, monkeypatch):
+    orders_csv = tmp_path / "orders.csv"
+    items_csv = tmp_path / "order_items.csv"
+    orders_csv.write_text(open(agent_functions.ORDERS_CSV).read())
+    items_csv.write_text(open(agent_functions.ORDER_ITEMS_CSV).read())
+    monkeypatch.setattr(agent_functions, "ORDERS_CSV", str(orders_csv))
+    monkeypatch.setattr(agent_functions, "ORDER_ITEMS_CSV", str(items_csv))
+    monkeypatch.setattr(agent_functions, "ORDER_SNAPSHOT", str(tmp_path / "missing.snapshot"))
+    monkeypatch.setattr(agent_functions, "STORE", agent_functions.load_store())
+    before = agent_functions.STORE
+
+    orders_csv.write_text(orders_csv.read_text().replace("Processing", "Delivered"))
+    after = agent_functions.reload_store()
+
+    assert after is agent_functions.STORE
+    assert after.version == before.version + 1
+    assert "Delivered" in get_order_status("10123")
+    assert after.get("10451") is before.get("10451")
+    assert agent_functions.reload_store() is after
+
+def test_normalize_order_id_spoken_forms():
+    assert normalize_order_id("one oh four five one") == "10451"
+    assert normalize_order_id("ten thousand four hundred fifty one") == "10451"
+    assert normalize_order_id("one oh double four five") == "10445"
+    assert normalize_order_id("one oh six forty-five") == "10645"
+    assert normalize_order_id("104 fifty one") == "10451"
+    assert normalize_order_id("order number 10 1 2 3") == "10123"
+    assert normalize_order_id("ten four hundred fifty one") == "10451"
+    assert normalize_order_id("one oh four hundred") == "10400"
+    assert normalize_order_id("ten one hundred") == "10100"
+    assert normalize_order_id("ten thousand one hundred twenty three") == "10123"
+    assert normalize_order_id("springfield order") == "springfield order"
+
+def test_misheard_digit_resolves_to_unique_order():
+    assert "Shipped" in get_order_status("one oh four five two")
+    assert "10451" in get_vendor_name("10541")
+    assert "Columbus" in get_delivery_address("1123")
+
+def test_ambiguous_order_id_lists_candidates():
+    # One digit short of both 10451 and 10645
+    assert get_order_status("1045") == (
+        "Sorry, I could not find any order with ID 1045. "
+        "Did you mean order 10451 or order 10645?"
+    )
+    assert get_order_status("99999") == "Sorry, I could not find any order with ID 99999."
+
+def test_store_lookup_finds_ids_one_edit_away():
+    ids = ["10451", "10457", "20000", "1045"]
+    store = OrderStore([{**STORE.get("10451"), "order_id": order_id} for order_id in ids])
+    assert store.lookup("10459") == ["1045", "10451", "10457"]
+    assert store.lookup("10459", limit=2) == ["1045", "10451"]
+    assert store.lookup("1045") == ["1045"]
+    assert store.lookup("10541") == ["10451"]
+    assert store.lookup("99999") == []
+
+def test_get_order_summary():
+    summary = get_order_summary("one zero four five one")
+    assert "Shipped" in summary
+    assert "Tech Supplies Co." in summary
+    assert "Wireless Ergonomic Mouse" in summary
+    assert "2025-06-25" in summary
+    assert "Springfield" in summary
+    assert "could not find" in get_order_summary("99999")
@@ -0,0 +1,70 @@
+import socket
+import asyncio
+import wave
+
+import numpy as np
+
+from audio_io import MemorySink, MemorySource, MicReader, SocketSource, WavSink, WavSource
+from conftest import write_wav
+
+
+def test_wav_source_hands_out_views_and_ends_with_the_file(tmp_path):
+    samples = np.arange(1000, dtype=np.int16)
+    write_wav(tmp_path / "in.wav", samples)
+    source = WavSource(str(tmp_path / "in.wav"), speed=1000)
+    assert source.rate == 16000
+    pieces = []
+    while True:
+        piece = source.read(300)
+        if not len(piece):
+            break
+        assert isinstance(piece, memoryview)
+        pieces.append(bytes(piece))
+    assert [len(p) for p in pieces] == [600, 600, 600, 200]
+    assert b"".join(pieces) == samples.tobytes()
+
+
+def test_looping_wav_source_wraps_around(tmp_path):
+    write_wav(tmp_path / "in.wav", np.arange(100, dtype=np.int16))
+    source = WavSource(str(tmp_path / "in.wav"), speed=1000, loop=True, offset=90)
+    assert np.frombuffer(source.read(20), dtype=np.int16).tolist() == list(range(90, 100)) + list(range(10))
+
+
+def test_socket_source_reads_full_frames_until_hang_up():
+    a, b = socket.socketpair()
+    source = SocketSource(a, rate=8000)
+    b.sendall(bytes(range(10)))
+    b.close()
+    assert bytes(source.read(4)) == bytes(range(8))
+    assert bytes(source.read(4)) == bytes(range(8, 10))
+    assert len(source.read(4)) == 0
+    source.close()
+
+
+def test_mic_reader_queues_end_of_source_marker():
+    async def main():
+        source = MemorySource(frames=[b"\x01\x00", b"\x02\x00"])
+        source.close()
+        reader = MicReader(source, asyncio.get_running_loop()).start()
+        pieces = [await reader.queue.get() for _ in range(3)]
+        reader.stop()
+        return pieces
+
+    first, second, end = asyncio.run(main())
+    assert (bytes(first), bytes(second), end) == (b"\x01\x00", b"\x02\x00", None)
+
+
+def test_sinks_keep_and_record_agent_audio(tmp_path):
+    async def main():
+        with MemorySink(16000) as memory, WavSink(16000, str(tmp_path / "out.wav")) as wav:
+            for sink in (memory, wav):
+                await sink.play(b"\x01\x00" * 160)
+                await sink.play(b"\x02\x00" * 160)
+        return memory, wav
+
+    memory, wav = asyncio.run(main())
+    wav.wait_closed()
+    assert memory.stats()["bytes_received"] == 640
+    with wave.open(str(tmp_path / "out.wav")) as f:
+        assert f.getnframes() == 320
+        assert f.readframes(320) == memory.audio()
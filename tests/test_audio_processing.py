@@ -0,0 +1,57 @@
+import numpy as np
+
+from agent_config import build_settings
+from audio_processing import MicProcessor, Resampler, mulaw_encode
+
+
+def tone(freq, rate, seconds=1.0):
+    t = np.arange(int(rate * seconds)) / rate
+    return (10000 * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+
+
+def resample_in_chunks(resampler, samples, chunk=1024):
+    return np.concatenate(
+        [resampler.process(samples[i:i + chunk].tobytes()) for i in range(0, len(samples), chunk)]
+    )
+
+
+def test_resampler_output_length_and_continuity():
+    out = resample_in_chunks(Resampler(44100, 16000), tone(440, 44100))
+    assert len(out) == 16000
+    # A 440 Hz tone stays smooth across chunk boundaries
+    assert np.abs(np.diff(out.astype(np.int32))).max() < 2000
+
+
+def test_resampler_filters_frequencies_above_new_nyquist():
+    out = resample_in_chunks(Resampler(44100, 16000), tone(12000, 44100))
+    assert np.sqrt(np.mean(out[100:].astype(np.float64) ** 2)) < 100
+
+
+def test_mulaw_encoding_is_monotonic_and_symmetric():
+    codes = mulaw_encode(np.array([0, 1000, 32767, -1000, -32768], dtype=np.int16))
+    assert list(codes) == [0xFF, 0xCE, 0x80, 0x4E, 0x00]
+
+
+def test_mic_processor_follows_settings():
+    settings = build_settings("mulaw", 8000)
+    assert settings["audio"]["input"] == {"encoding": "mulaw", "sample_rate": 8000}
+    processor = MicProcessor(44100, settings["audio"]["input"])
+    [payload] = processor.process(tone(440, 44100, 0.5).tobytes())
+    assert abs(len(payload) - 4000) <= 1
+
+
+def test_vad_suppresses_silence_and_keeps_pre_roll():
+    processor = MicProcessor(
+        16000,
+        {"encoding": "linear16", "sample_rate": 16000},
+        {"pre_roll_ms": 100, "hangover_ms": 200},
+    )
+    silence = np.zeros(320, dtype=np.int16).tobytes()
+    speech = tone(300, 16000, 0.02).tobytes()
+
+    assert all(processor.process(silence) == [] for _ in range(50))
+    onset = processor.process(speech)
+    # Pre-roll (100 ms = 5 buffers) is released together with the first speech buffer
+    assert len(onset) == 6
+    assert sum(len(processor.process(silence)) for _ in range(50)) == 10
+    assert processor.stats()["bytes_suppressed"] == (50 + 50 - 5 - 10) * 640
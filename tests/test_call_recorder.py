@@ -0,0 +1,45 @@
+import json
+import time
+import wave
+
+import numpy as np
+
+from call_recorder import CallRecorder
+
+
+def test_both_directions_land_on_their_own_channel_with_aligned_events(tmp_path):
+    path = str(tmp_path / "call.wav")
+    tone = (np.ones(1600) * 1000).astype(np.int16)
+    with CallRecorder(path, caller_rate=16000, agent_rate=16000) as recorder:
+        recorder.event("status", status="ready")
+        recorder.caller_audio(memoryview(tone.tobytes()))
+        recorder.agent_audio((tone * 2).tobytes())
+        time.sleep(0.2)
+        recorder.event("conversation_text", role="user", content="Hi")
+
+    with wave.open(path, "rb") as f:
+        assert (f.getnchannels(), f.getsampwidth(), f.getframerate()) == (2, 2, 16000)
+        audio = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16).reshape(-1, 2)
+    assert (audio[:, 0] == 1000).sum() == 1600
+    assert (audio[:, 1] == 2000).sum() == 1600
+    # The agent's reply starts where it arrived, not at the caller's audio
+    assert audio[:, 1].nonzero()[0][0] >= audio[:, 0].nonzero()[0][0]
+
+    lines = [json.loads(line) for line in open(tmp_path / "call.jsonl")]
+    assert [line["type"] for line in lines] == ["status", "conversation_text", "recording"]
+    assert lines[1]["content"] == "Hi" and lines[1]["t_ms"] >= 200
+    assert lines[-1]["dropped_items"] == 0
+
+
+def test_barge_in_cuts_unplayed_agent_audio(tmp_path):
+    path = str(tmp_path / "call.wav")
+    with CallRecorder(path, caller_rate=16000, agent_rate=8000, sample_rate=8000) as recorder:
+        # Five seconds of reply arrive at once, then the caller interrupts
+        recorder.agent_audio((np.ones(40000) * 500).astype(np.int16).tobytes())
+        time.sleep(0.3)
+        recorder.event("user_started_speaking")
+
+    with wave.open(path, "rb") as f:
+        audio = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16).reshape(-1, 2)
+    played = (audio[:, 1] != 0).sum()
+    assert 0.2 * 8000 < played < 1.0 * 8000
@@ -0,0 +1,116 @@
+import time
+import asyncio
+import threading
+
+import numpy as np
+
+from audio_io import MemorySink, WavSource
+from call_runner import CallRunner
+from event_bus import EventBus
+from mock_agent_server import MockAgentServer
+from prompt_cache import PromptCache
+from speaker import Speaker
+from conftest import FakeAudio, wait_until, write_wav
+
+SCRIPT = {
+    "greeting_seconds": 30,
+    "turns": [
+        {
+            "user": "Bye.",
+            "functions": [{"name": "end_story", "arguments": {}}],
+            "after_audio": 0,
+            "agent_audio_seconds": 0.1,
+        },
+    ],
+}
+
+
+class MockThread:
+    # Serves the mock agent from its own loop so the runner's loop is separate
+    def __init__(self, script):
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.mock = MockAgentServer(script, speed=10)
+        threading.Thread(target=self._run, daemon=True).start()
+        self.ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(self.mock.serve("127.0.0.1", 0))
+        self.uri = f"ws://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+        self.ready.set()
+        self.loop.run_forever()
+
+
+def test_calls_reuse_the_loop_and_devices_and_end_on_command(tmp_path):
+    write_wav(tmp_path / "caller.wav", np.zeros(16000))
+    agent = MockThread(SCRIPT)
+    sources = []
+
+    def source_factory():
+        sources.append(WavSource(str(tmp_path / "caller.wav"), speed=10, loop=True))
+        return sources[-1]
+
+    runner = CallRunner(agent.uri, source_factory=source_factory, speaker_factory=MemorySink)
+    try:
+        for _ in range(2):
+            events = EventBus()
+            shared = {}
+            runner.start_call(shared, events)
+            assert wait_until(lambda: shared.get("agent_ready"))
+            started = time.monotonic()
+            runner.end_call()
+            assert wait_until(lambda: not runner.running)
+            assert time.monotonic() - started < 1.0
+            assert not shared.get("goodbye_triggered")
+            assert events.read()[0][-1]["status"] == "ended"
+
+        # One source and one speaker served both calls
+        assert len(sources) == 1
+        assert runner._speaker.bytes_received > 0
+    finally:
+        runner.close()
+
+
+def test_pooled_connection_is_used_when_the_greeting_is_local(tmp_path):
+    write_wav(tmp_path / "caller.wav", np.zeros(16000))
+    agent = MockThread(SCRIPT)
+    prompts = PromptCache(16000, {})
+    prompts.add("greeting", bytes(3200), 16000)
+    runner = CallRunner(
+        agent.uri,
+        pool_size=1,
+        source_factory=lambda: WavSource(str(tmp_path / "caller.wav"), speed=10, loop=True),
+        speaker_factory=MemorySink,
+        prompts=prompts,
+    )
+    try:
+        assert runner.connections.settings == runner.settings
+        assert wait_until(lambda: len(runner.connections) == 1)
+        shared = {}
+        runner.start_call(shared)
+        assert wait_until(lambda: shared.get("agent_ready"))
+        runner.end_call()
+        assert wait_until(lambda: not runner.running)
+        assert runner.connections.stats()["hits"] == 1
+    finally:
+        runner.close()
+
+
+def test_ending_a_call_drops_queued_agent_audio(tmp_path, fake_pyaudio):
+    write_wav(tmp_path / "caller.wav", np.zeros(16000))
+    agent = MockThread(SCRIPT)
+    runner = CallRunner(
+        agent.uri,
+        source_factory=lambda: WavSource(str(tmp_path / "caller.wav"), speed=10, loop=True),
+        speaker_factory=lambda sample_rate: Speaker(sample_rate, audio=FakeAudio()),
+    )
+    try:
+        runner.start_call({})
+        assert wait_until(lambda: len(runner._speaker._ring) > 0)
+        runner.end_call()
+        assert wait_until(lambda: not runner.running)
+        assert len(runner._speaker._ring) == 0
+        assert not runner._speaker._playing
+    finally:
+        runner.close()
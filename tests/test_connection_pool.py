@@ -0,0 +1,118 @@
+import json
+import asyncio
+
+import websockets
+
+from connection_pool import ConnectionPool, open_connection
+
+
+# Every Settings message the agent has been sent
+SETTINGS = []
+
+
+async def agent(ws, *_):
+    # Minimal agent: applies settings, then reports what it hears
+    settings = json.loads(await ws.recv())
+    SETTINGS.append(settings)
+    await ws.send(json.dumps({"type": "Welcome"}))
+    await ws.send(json.dumps({"type": "SettingsApplied", "settings": settings["type"]}))
+    async for message in ws:
+        if message == b"drop":
+            ws.transport.abort()
+            return
+        if message == b"talk":
+            await ws.send(json.dumps({"type": "ConversationText", "role": "user", "content": "Hi"}))
+            continue
+        await ws.send(json.dumps({"type": "Heard", "size": len(message)}))
+
+
+def run_with_agent(test):
+    async def main():
+        server = await websockets.serve(agent, "127.0.0.1", 0)
+        try:
+            return await test(f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}")
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(main())
+
+
+async def read_types(conn, count):
+    types = []
+    async for message in conn:
+        types.append(json.loads(message)["type"])
+        if len(types) == count:
+            return types
+
+
+def test_pool_hands_out_configured_connections_and_refills():
+    async def test(uri):
+        async with ConnectionPool(uri, {"type": "Settings"}, size=2, headers={}) as pool:
+            while len(pool) < 2:
+                await asyncio.sleep(0.01)
+            async with await pool.acquire() as conn:
+                replayed = await read_types(conn, 2)
+                await conn.send(b"audio")
+                live = await read_types(conn, 1)
+            while len(pool) < 2:
+                await asyncio.sleep(0.01)
+            async with await pool.acquire({"type": "Settings", "other": True}):
+                pass
+            return replayed, live, pool.stats()
+
+    replayed, live, stats = run_with_agent(test)
+    assert replayed == ["Welcome", "SettingsApplied"]
+    assert live == ["Heard"]
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_connection_reconnects_and_flushes_buffered_audio():
+    async def test(uri):
+        async with await open_connection(uri, {"type": "Settings"}, headers={}) as conn:
+            assert await read_types(conn, 2) == ["Welcome", "SettingsApplied"]
+            await conn.send(b"drop")
+            await asyncio.sleep(0.1)
+            # The first send finds the socket gone; these are all held and
+            # flushed once the new one is configured
+            for _ in range(20):
+                await conn.send(b"x" * 100)
+                await asyncio.sleep(0.005)
+            types = await read_types(conn, 2)
+            heard = 0
+            async for message in conn:
+                heard += json.loads(message)["size"]
+                if heard == 2000:
+                    break
+            return types, conn.stats()
+
+    types, stats = run_with_agent(test)
+    assert types == ["Welcome", "SettingsApplied"]
+    assert stats["reconnects"] == 1
+    assert stats["dropped_bytes"] == 0
+
+
+def test_reconnect_continues_the_conversation_without_a_greeting():
+    settings = {"type": "Settings", "agent": {"greeting": "Hello!", "think": {}}}
+
+    async def test(uri):
+        async with await open_connection(uri, settings, headers={}) as conn:
+            await read_types(conn, 2)
+            await conn.send(b"talk")
+            assert await read_types(conn, 1) == ["ConversationText"]
+            await conn.send(b"drop")
+            await asyncio.sleep(0.1)
+            await conn.send(b"x")
+            assert await read_types(conn, 2) == ["Welcome", "SettingsApplied"]
+            return conn.stats()
+
+    SETTINGS.clear()
+    stats = run_with_agent(test)
+    assert stats["reconnects"] == 1
+    first, resumed = SETTINGS
+    assert first == settings
+    assert "greeting" not in resumed["agent"]
+    assert resumed["agent"]["think"] == {}
+    assert resumed["agent"]["context"]["messages"] == [
+        {"type": "History", "role": "user", "content": "Hi"}
+    ]
@@ -0,0 +1,44 @@
+import asyncio
+
+from dispatch import STOP, Dispatcher, dumps, loads
+
+
+def test_messages_reach_handlers_for_their_type_in_order():
+    seen = []
+
+    async def on_done(msg):
+        seen.append(("async", msg["type"]))
+        return STOP
+
+    dispatcher = Dispatcher(
+        binary=lambda data: seen.append(("audio", len(data))),
+        default=lambda msg: seen.append(("default", msg["type"])),
+    )
+    dispatcher.register("AgentAudioDone", lambda msg: seen.append(("sync", msg["type"])))
+    dispatcher.register("AgentAudioDone", on_done)
+    dispatcher.update({"Welcome": [lambda msg: seen.append(("welcome", msg["request_id"]))]})
+
+    async def main():
+        return [
+            await dispatcher.dispatch(b"\x00\x00"),
+            await dispatcher.dispatch(dumps({"type": "Welcome", "request_id": "r1"})),
+            await dispatcher.dispatch('{"type": "Mystery"}'),
+            await dispatcher.dispatch('{"type": "AgentAudioDone"}'),
+        ]
+
+    assert asyncio.run(main()) == [None, None, None, STOP]
+    assert seen == [
+        ("audio", 2),
+        ("welcome", "r1"),
+        ("default", "Mystery"),
+        ("sync", "AgentAudioDone"),
+        ("async", "AgentAudioDone"),
+    ]
+    assert "Welcome" in dispatcher and "Mystery" not in dispatcher
+
+
+def test_codec_round_trips_text_messages():
+    message = {"type": "FunctionCallResponse", "id": "1", "content": "Bye 👋"}
+    encoded = dumps(message)
+    assert isinstance(encoded, str)
+    assert loads(encoded) == message
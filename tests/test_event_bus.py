@@ -0,0 +1,39 @@
+import logging
+
+from event_bus import EventBus, EventBusHandler
+
+
+def test_readers_only_get_new_events():
+    bus = EventBus(capacity=10)
+    bus.publish("conversation_text", role="user", content="hi")
+    events, cursor = bus.read(0)
+    assert [(e["seq"], e["type"], e["content"]) for e in events] == [(0, "conversation_text", "hi")]
+    assert bus.read(cursor) == ([], 1)
+    bus.publish("status", status="ended")
+    events, cursor = bus.read(cursor)
+    assert [e["status"] for e in events] == ["ended"] and cursor == 2
+
+
+def test_ring_stays_bounded_and_slow_readers_skip_ahead():
+    bus = EventBus(capacity=10)
+    for i in range(25):
+        bus.publish("log", message=str(i))
+    assert len(bus) == 10
+    events, cursor = bus.read(3)
+    assert [e["message"] for e in events] == [str(i) for i in range(15, 25)]
+    assert cursor == 25
+    events, _ = bus.read(20, limit=2)
+    assert [e["seq"] for e in events] == [20, 21]
+
+
+def test_log_handler_publishes_records():
+    bus = EventBus()
+    log = logging.getLogger("test_event_bus")
+    handler = EventBusHandler(bus)
+    log.addHandler(handler)
+    try:
+        log.warning("order %s not found", "123")
+    finally:
+        log.removeHandler(handler)
+    [event] = bus.read()[0]
+    assert (event["type"], event["level"], event["message"]) == ("log", "WARNING", "order 123 not found")
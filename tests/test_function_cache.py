@@ -0,0 +1,53 @@
+from function_cache import FunctionCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(**kwargs):
+    calls = []
+    version = {"value": 0}
+
+    def lookup(order_id):
+        calls.append(order_id)
+        return f"result {len(calls)}"
+
+    cache = FunctionCache(version=lambda: version["value"], **kwargs)
+    return cache, cache.wrap("lookup", lookup), calls, version
+
+
+def test_hits_share_normalized_arguments():
+    cache, lookup, calls, _ = make_cache()
+    assert lookup(order_id="10451") == "result 1"
+    assert lookup(order_id="one oh four five one") == "result 1"
+    assert calls == ["10451"]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_and_lru_eviction():
+    clock = Clock()
+    cache, lookup, calls, _ = make_cache(ttl=10, max_entries=2, clock=clock)
+    lookup(order_id="1")
+    lookup(order_id="2")
+    lookup(order_id="3")
+    assert len(cache) == 2
+    lookup(order_id="1")
+    assert calls == ["1", "2", "3", "1"]
+
+    clock.now = 11
+    lookup(order_id="3")
+    assert calls[-1] == "3"
+
+
+def test_data_version_change_invalidates():
+    cache, lookup, calls, version = make_cache()
+    lookup(order_id="10451")
+    version["value"] += 1
+    assert lookup(order_id="10451") == "result 2"
+    assert len(calls) == 2
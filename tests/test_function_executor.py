@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+from function_executor import FunctionExecutor, new_pool
+
+
+def slow(delay):
+    time.sleep(delay)
+    return f"slept {delay}"
+
+
+def broken():
+    raise RuntimeError("boom")
+
+
+FUNCTIONS = {"slow": slow, "broken": broken}
+
+
+def test_calls_run_concurrently_off_the_loop():
+    async def main():
+        with FunctionExecutor(FUNCTIONS) as executor:
+            start = time.perf_counter()
+            results = await asyncio.gather(
+                executor.call("slow", '{"delay": 0.2}'),
+                executor.call("slow", '{"delay": 0.2}'),
+                asyncio.sleep(0.05, result="loop free"),
+            )
+            return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(main())
+    assert results == ["slept 0.2", "slept 0.2", "loop free"]
+    assert elapsed < 0.35
+
+
+def test_timeouts_and_failures_become_responses():
+    async def main():
+        with FunctionExecutor(FUNCTIONS, timeouts={"slow": 0.05}) as executor:
+            return await asyncio.gather(
+                executor.call("slow", '{"delay": 0.2}'),
+                executor.call("broken"),
+                executor.call("missing"),
+            )
+
+    assert asyncio.run(main()) == [
+        "Function timed out.",
+        "Function execution failed.",
+        "Function not found.",
+    ]
+
+
+def test_shared_pool_outlives_executors():
+    pool = new_pool(2)
+
+    async def main():
+        with FunctionExecutor({"slow": slow}, pool=pool) as first:
+            await first.call("slow", '{"delay": 0}')
+        with FunctionExecutor({"slow": slow}, pool=pool) as second:
+            return await second.call("slow", '{"delay": 0}')
+
+    try:
+        assert asyncio.run(main()) == "slept 0"
+    finally:
+        pool.shutdown()
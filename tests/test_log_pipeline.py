@@ -0,0 +1,53 @@
+import json
+import logging
+
+import pytest
+
+from log_pipeline import JsonLinesFormatter, LogPipeline, parse_sample_rates
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+def test_records_are_sampled_per_type_and_written_as_json_lines():
+    handler = ListHandler()
+    handler.setFormatter(JsonLinesFormatter())
+    logger = logging.getLogger("test_log_pipeline")
+    logger.propagate = False
+    pipeline = LogPipeline(
+        logging.INFO, handlers=[handler], logger=logger, sample={"ConversationText": 3}
+    )
+    with pipeline:
+        for i in range(7):
+            logger.info("Content: %s", i, extra={"msg_type": "ConversationText"})
+        logger.info("Agent finished speaking.", extra={"msg_type": "AgentAudioDone"})
+        logger.warning("Warning: %s", "x", extra={"msg_type": "ConversationText"})
+        logger.debug("not written")
+
+    entries = [json.loads(line) for line in handler.lines]
+    assert [e["message"] for e in entries] == [
+        "Content: 0",
+        "Content: 3",
+        "Content: 6",
+        "Agent finished speaking.",
+        "Warning: x",
+    ]
+    assert entries[0]["msg_type"] == "ConversationText"
+    assert entries[-1]["level"] == "WARNING"
+    assert pipeline.stats()["dropped_sampled"] == 4
+    assert handler not in logger.handlers and not logger.handlers
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates(["ConversationText=10", "Welcome=1"]) == {
+        "ConversationText": 10,
+        "Welcome": 1,
+    }
+    with pytest.raises(ValueError):
+        parse_sample_rates(["ConversationText"])
@@ -0,0 +1,62 @@
+import json
+import asyncio
+
+import websockets
+
+from mock_agent_server import MockAgentServer
+
+SCRIPT = {
+    "greeting_seconds": 0.1,
+    "turns": [
+        {
+            "user": "Where is order 10451?",
+            "functions": [{"name": "get_order_status", "arguments": {"order_id": "10451"}}],
+            "after_audio": 0.1,
+            "agent_audio_seconds": 0.1,
+        },
+    ],
+}
+
+
+def test_scripted_conversation_round_trip():
+    async def main():
+        mock = MockAgentServer(SCRIPT, speed=10)
+        server = await mock.serve("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        seen = []
+        audio = 0
+        async with websockets.connect(f"ws://127.0.0.1:{port}") as ws:
+            settings = {"type": "Settings", "audio": {"input": {"encoding": "linear16", "sample_rate": 16000}}}
+            await ws.send(json.dumps(settings))
+            async for message in ws:
+                if isinstance(message, bytes):
+                    audio += len(message)
+                    continue
+                message = json.loads(message)
+                seen.append(message["type"])
+                if message["type"] == "SettingsApplied":
+                    await ws.send(bytes(3200))
+                elif message["type"] == "FunctionCallRequest":
+                    for function in message["functions"]:
+                        reply = {"type": "FunctionCallResponse", "id": function["id"], "content": "shipped"}
+                        await ws.send(json.dumps(reply))
+                elif message["type"] == "ConversationText" and message["role"] == "assistant":
+                    assert message["content"] == "shipped"
+                elif seen.count("AgentAudioDone") == 2:
+                    break
+        server.close()
+        await server.wait_closed()
+        return seen, audio, mock.stats()
+
+    seen, audio, stats = asyncio.run(main())
+    assert seen[:2] == ["Welcome", "SettingsApplied"]
+    assert seen[2:] == [
+        "AgentAudioDone",
+        "UserStartedSpeaking",
+        "ConversationText",
+        "FunctionCallRequest",
+        "ConversationText",
+        "AgentAudioDone",
+    ]
+    assert audio > 0
+    assert stats["function_calls"] == 1
@@ -0,0 +1,63 @@
+import json
+import threading
+
+from agent_functions import ORDERS_CSV, ORDER_ITEMS_CSV, OrderStore, load_orders
+from order_db import OrderDB, import_csv, import_json
+
+
+def test_db_matches_csv_store(tmp_path):
+    path = str(tmp_path / "orders.db")
+    assert import_csv(path, ORDERS_CSV, ORDER_ITEMS_CSV) == 3
+
+    store = OrderStore(load_orders())
+    db = OrderDB(path)
+    try:
+        assert len(db) == len(store)
+        assert list(db.ids()) == list(store.ids())
+        for order_id in store.ids():
+            assert db.get(order_id) == store.get(order_id)
+        assert db.get("99999") is None
+        assert db.find_by_vendor("AUDIOGEAR INC.") == store.find_by_vendor("audiogear inc.")
+        assert db.find_by_status("shipped") == store.find_by_status("shipped")
+    finally:
+        db.close()
+
+
+def test_json_import_replaces_contents(tmp_path):
+    path = str(tmp_path / "orders.db")
+    import_csv(path, ORDERS_CSV, ORDER_ITEMS_CSV)
+    orders = load_orders()[:1]
+    json_path = tmp_path / "orders.json"
+    json_path.write_text(json.dumps(orders))
+    assert import_json(path, json_path) == 1
+
+    db = OrderDB(path)
+    try:
+        assert db.get(orders[0]["order_id"]) == orders[0]
+        assert len(db) == 1
+    finally:
+        db.close()
+
+
+def test_lookup_and_threaded_connections(tmp_path):
+    path = str(tmp_path / "orders.db")
+    import_csv(path, ORDERS_CSV, ORDER_ITEMS_CSV)
+    db = OrderDB(path)
+    order_id = next(db.ids())
+    swapped = order_id[:-2] + order_id[-1] + order_id[-2]
+    results = []
+
+    def query():
+        results.append((db.get(order_id)["order_id"], db.lookup(swapped), db.lookup(order_id)))
+
+    try:
+        threads = [threading.Thread(target=query) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == [(order_id, [order_id], [order_id])] * 4
+        assert db.lookup("abcdef") == []
+        assert len(db._connections) == 5
+    finally:
+        db.close()
@@ -0,0 +1,59 @@
+from agent_functions import ORDERS_CSV, ORDER_ITEMS_CSV, OrderStore, load_orders
+from order_snapshot import OrderSnapshot, compile_snapshot
+
+
+def test_snapshot_matches_csv_store(tmp_path):
+    path = tmp_path / "orders.snapshot"
+    assert compile_snapshot(ORDERS_CSV, ORDER_ITEMS_CSV, path) == 3
+
+    store = OrderStore(load_orders())
+    snapshot = OrderSnapshot(path)
+    try:
+        assert len(snapshot) == len(store)
+        assert sorted(snapshot.ids()) == sorted(store.ids())
+        for order_id in store.ids():
+            assert snapshot.get(order_id) == store.get(order_id)
+        assert snapshot.get("99999") is None
+        assert snapshot.find_by_vendor("AUDIOGEAR INC.") == store.find_by_vendor("audiogear inc.")
+        assert snapshot.find_by_status("shipped") == store.find_by_status("shipped")
+        assert snapshot.lookup("10541") == store.lookup("10541") == ["10451"]
+    finally:
+        snapshot.close()
+
+
+def test_recompiling_leaves_open_snapshots_readable(tmp_path):
+    path = tmp_path / "orders.snapshot"
+    compile_snapshot(ORDERS_CSV, ORDER_ITEMS_CSV, path)
+    snapshot = OrderSnapshot(path)
+    try:
+        before = snapshot.get("10451")
+        compile_snapshot(ORDERS_CSV, ORDER_ITEMS_CSV, path)
+        assert snapshot.get("10451") == before
+        fresh = OrderSnapshot(path)
+        assert fresh.get("10451") == before
+        fresh.close()
+        assert [p.name for p in tmp_path.iterdir()] == ["orders.snapshot"]
+    finally:
+        snapshot.close()
+
+
+def test_repeated_order_id_keeps_the_last_row_like_the_csv_store(tmp_path):
+    with open(ORDERS_CSV) as f:
+        lines = f.read().splitlines()
+    repeated = next(line for line in lines if line.startswith("10451,"))
+    orders_csv = tmp_path / "orders.csv"
+    orders_csv.write_text("\n".join([*lines, repeated.replace("Shipped", "Delivered")]) + "\n")
+    path = tmp_path / "orders.snapshot"
+
+    store = OrderStore(load_orders(orders_csv, ORDER_ITEMS_CSV))
+    assert compile_snapshot(orders_csv, ORDER_ITEMS_CSV, path) == len(store) == 3
+    snapshot = OrderSnapshot(path)
+    try:
+        assert len(snapshot) == 3
+        for order_id in store.ids():
+            assert snapshot.get(order_id) == store.get(order_id)
+        assert snapshot.get("10451")["status"] == "Delivered"
+        assert snapshot.find_by_status("shipped") == store.find_by_status("shipped")
+        assert snapshot.find_by_status("delivered") == store.find_by_status("delivered")
+    finally:
+        snapshot.close()
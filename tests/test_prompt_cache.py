@@ -0,0 +1,143 @@
+import json
+import time
+import wave
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from agent_config import AGENT_SETTINGS
+from audio_io import MemorySink, WavSource
+from event_bus import EventBus
+from function_cache import FUNCTION_CACHE
+from main import start_stream
+from mock_agent_server import MockAgentServer
+from prompt_cache import PromptCache
+from conftest import SCRIPT, write_wav
+
+
+def test_prompts_are_resampled_and_replace_the_agent_greeting(tmp_path):
+    write_wav(tmp_path / "greeting.wav", np.full(22050, 1000), 22050)
+    prompts = PromptCache(
+        16000,
+        {
+            "greeting": str(tmp_path / "greeting.wav"),
+            "goodbye": str(tmp_path / "missing.wav"),
+            # 19 s of caller speech: agent audio would wait behind it
+            "intro": "./data/preamble.wav",
+        },
+    )
+    assert "greeting" in prompts and "goodbye" not in prompts and "intro" not in prompts
+    assert abs(prompts.duration("greeting") - 1.0) < 0.01
+
+    settings = prompts.settings_for(AGENT_SETTINGS)
+    assert "greeting" not in settings["agent"]
+    assert "greeting" in AGENT_SETTINGS["agent"]
+    assert PromptCache(16000, {}).settings_for(AGENT_SETTINGS) is AGENT_SETTINGS
+
+    # Only the filler chime ships; the agent keeps its greeting by default
+    defaults = PromptCache(16000)
+    assert "one_moment" in defaults and "greeting" not in defaults
+    assert defaults.duration("one_moment") < 1.0
+    assert defaults.settings_for(AGENT_SETTINGS) is AGENT_SETTINGS
+
+
+def test_greeting_plays_before_the_agent_and_fillers_cover_slow_functions(tmp_path):
+    write_wav(tmp_path / "caller.wav", np.zeros(16000), 16000)
+    prompts = PromptCache(16000, {})
+    prompts.add("greeting", np.full(1600, 1000, dtype=np.int16).tobytes(), 16000)
+    prompts.add("one_moment", np.full(800, 2000, dtype=np.int16).tobytes(), 16000)
+    sinks = []
+
+    def speaker_factory(sample_rate):
+        sinks.append(MemorySink(sample_rate))
+        return sinks[-1]
+
+    def slow_status(order_id):
+        time.sleep(1.0)
+        return "Shipped"
+
+    # A cached answer from the stock functions must not stand in for this one
+    FUNCTION_CACHE.put("get_order_status", {"order_id": "10451"}, "Cached")
+
+    async def main():
+        server = await MockAgentServer(SCRIPT, speed=10).serve("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        shared = {}
+        events = EventBus()
+        await start_stream(
+            WavSource(str(tmp_path / "caller.wav"), speed=10, loop=True),
+            f"ws://127.0.0.1:{port}",
+            shared,
+            vad={"enabled": False},
+            speaker_factory=speaker_factory,
+            function_map={"get_order_status": slow_status},
+            events=events,
+            record_path=str(tmp_path / "call.wav"),
+            prompts=prompts,
+        )
+        server.close()
+        await server.wait_closed()
+        return shared, events
+
+    shared, events = asyncio.run(main())
+    assert shared["goodbye_triggered"]
+    chunks = sinks[0].chunks
+    assert bytes(chunks[0]) == bytes(prompts.get("greeting"))
+    assert sum(bytes(chunk) == bytes(prompts.get("one_moment")) for chunk in chunks) == 1
+    prompt_events = [e["name"] for e in events.read()[0] if e["type"] == "prompt"]
+    assert prompt_events == ["greeting", "one_moment"]
+
+    # The agent channel of the recording carries the prompts too
+    with wave.open(str(tmp_path / "call.wav"), "rb") as f:
+        agent = np.frombuffer(f.readframes(f.getnframes()), dtype="<i2")[1::2]
+    # It opens with the greeting (until the caller barges in) and has the filler
+    assert agent[np.flatnonzero(agent)[0]] == 1000
+    assert np.count_nonzero(agent == 2000) > 0
+
+
+class SpeakHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        query = parse_qs(urlparse(self.path).query)
+        SpeakHandler.requests.append((query, body, self.headers["Authorization"]))
+        self.send_response(200)
+        self.end_headers()
+        # Half a second of audio at the requested rate
+        self.wfile.write(np.full(int(query["sample_rate"][0]) // 2, 500, dtype="<i2").tobytes())
+
+    def log_message(self, *args):
+        pass
+
+
+def test_agent_greeting_is_rendered_once_and_cached(tmp_path):
+    server = HTTPServer(("127.0.0.1", 0), SpeakHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/v1/speak"
+    SpeakHandler.requests.clear()
+    try:
+        for _ in range(2):
+            prompts = PromptCache(16000, {})
+            assert prompts.add_greeting(AGENT_SETTINGS, tmp_path, url, {"Authorization": "Token t"})
+            assert abs(prompts.duration("greeting") - 0.5) < 0.01
+            assert "greeting" not in prompts.settings_for(AGENT_SETTINGS)["agent"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # The second start reads the cached file
+    assert len(SpeakHandler.requests) == 1
+    query, body, authorization = SpeakHandler.requests[0]
+    assert body == {"text": AGENT_SETTINGS["agent"]["greeting"]}
+    assert query["model"] == [AGENT_SETTINGS["agent"]["speak"]["provider"]["model"]]
+    assert query["sample_rate"] == ["16000"]
+    assert authorization == "Token t"
+
+    # Without a speak service the agent keeps its own greeting
+    prompts = PromptCache(16000, {})
+    assert not prompts.add_greeting(AGENT_SETTINGS, tmp_path / "other", url, {})
+    assert prompts.settings_for(AGENT_SETTINGS) is AGENT_SETTINGS
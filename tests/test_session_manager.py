@@ -0,0 +1,78 @@
+import time
+import asyncio
+
+import numpy as np
+
+from audio_io import MemorySink, MemorySource, WavSource
+from event_bus import EventBus
+from mock_agent_server import MockAgentServer
+from session_manager import SessionManager
+from conftest import SCRIPT, write_wav
+
+
+def test_sessions_run_side_by_side_with_their_own_settings(tmp_path):
+    write_wav(tmp_path / "caller.wav", np.zeros(16000))
+
+    async def main():
+        mock = MockAgentServer(SCRIPT, speed=10)
+        server = await mock.serve("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with SessionManager(
+            f"ws://127.0.0.1:{port}", max_sessions=2, vad={"enabled": False}, speaker_factory=MemorySink
+        ) as manager:
+            sessions = []
+            for index in range(3):
+                source = WavSource(str(tmp_path / "caller.wav"), speed=10, loop=True)
+                overrides = {"audio": {"input": {"sample_rate": 8000}}} if index == 0 else None
+                sessions.append(
+                    manager.start(source, f"call-{index}", overrides, events=EventBus())
+                )
+            await manager.wait()
+        server.close()
+        await server.wait_closed()
+        return manager, sessions, mock.stats()
+
+    manager, sessions, server_stats = asyncio.run(main())
+    assert manager.stats() == {"active": 0, "max_sessions": 2, "finished": 3}
+    assert server_stats["completed"] == 3
+    assert all(s.metrics()["completed"] for s in sessions)
+    assert sessions[0].settings["audio"]["input"]["sample_rate"] == 8000
+    assert sessions[1].settings["audio"]["input"]["sample_rate"] == 16000
+    assert all(s.metrics()["mic"]["bytes_sent"] > 0 for s in sessions)
+    assert all(s.metrics()["speaker"]["bytes_received"] > 0 for s in sessions)
+    events, _ = sessions[0].events.read()
+    assert [e["role"] for e in events if e["type"] == "conversation_text"] == ["user", "assistant"] * 2
+    assert [e["status"] for e in events if e["type"] == "status"] == ["connected", "ready", "ended"]
+
+
+def test_an_idle_source_does_not_stall_the_loop_when_a_session_ends():
+    async def main():
+        server = await MockAgentServer(SCRIPT, speed=10).serve("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        gaps = []
+
+        async def tick():
+            last = time.perf_counter()
+            while True:
+                await asyncio.sleep(0.01)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        ticker = asyncio.create_task(tick())
+        async with SessionManager(
+            f"ws://127.0.0.1:{port}", vad={"enabled": False}, speaker_factory=MemorySink
+        ) as manager:
+            # A few frames, then nothing: the reader blocks in read()
+            session = manager.start(MemorySource(16000, [bytes(640)] * 5))
+            await manager.wait()
+        # Let the ticker see any stall at the very end
+        await asyncio.sleep(0.05)
+        ticker.cancel()
+        server.close()
+        await server.wait_closed()
+        return session, max(gaps)
+
+    session, longest_gap = asyncio.run(main())
+    assert session.metrics()["completed"]
+    assert longest_gap < 0.5
@@ -0,0 +1,141 @@
+import time
+import asyncio
+
+import numpy as np
+import pytest
+
+from audio_io import MemorySink, WavSource
+from main import start_stream
+from mock_agent_server import MockAgentServer
+from speaker import RingBuffer, Speaker
+from conftest import FakeAudio, wait_until, write_wav
+
+
+@pytest.fixture
+def fake_speaker(fake_pyaudio):
+    audio = FakeAudio()
+    with Speaker(16000, audio=audio) as spk:
+        yield spk, audio.stream
+
+
+def test_ring_buffer_wraps_around_and_counts_overruns():
+    ring = RingBuffer(10)
+    out = bytearray(10)
+    ring.write(b"abcdef")
+    assert ring.read_into(out, 4) == 4 and out[:4] == b"abcd"
+    # Wraps past the end of the storage
+    ring.write(b"ghijkl")
+    assert len(ring) == 8
+    assert ring.read_into(out, 10) == 8 and out[:8] == b"efghijkl"
+
+    ring.write(b"0123456")
+    ring.write(b"789ab")
+    assert (ring.overruns, ring.dropped_bytes) == (1, 2)
+    assert ring.read_into(out, 10) == 10 and out == b"23456789ab"
+
+    # A write bigger than the whole ring keeps only its newest bytes
+    ring.write(b"x" * 3 + b"0123456789")
+    assert ring.dropped_bytes == 5
+    assert ring.read_into(out, 10) == 10 and out == b"0123456789"
+    assert ring.read_into(out, 10) == 0
+
+
+def test_small_messages_are_played_in_whole_chunks(fake_speaker):
+    spk, stream = fake_speaker
+    # Twenty chunks and a bit
+    audio = bytes(range(256)) * 25 + bytes(64)
+
+    async def feed():
+        for start in range(0, len(audio), 64):
+            await spk.play(audio[start:start + 64])
+
+    asyncio.run(feed())
+    assert wait_until(lambda: sum(map(len, stream.writes)) == len(audio))
+    assert b"".join(stream.writes) == audio
+    assert {len(write) for write in stream.writes[:-1]} == {spk.chunk_bytes}
+    # The last partial chunk ran dry without finish()
+    assert spk.underruns == 1
+
+
+def test_finish_plays_out_the_tail_without_an_underrun(fake_speaker):
+    spk, stream = fake_speaker
+    tail = b"\x01\x02" * 50
+
+    # Short of the target depth and of a whole chunk, but the agent is done
+    asyncio.run(spk.play(tail))
+    spk.finish()
+    assert wait_until(lambda: stream.writes == [tail])
+    assert spk.underruns == 0
+    assert spk.stats()["buffered_ms"] == 0
+
+
+def test_stop_flushes_once_and_times_the_barge_in(fake_speaker):
+    spk, stream = fake_speaker
+    asyncio.run(spk.play(bytes(32000)))
+    assert wait_until(lambda: stream.writes)
+    received_at = time.perf_counter() - 0.05
+
+    spk.stop(received_at=received_at)
+    assert len(spk._ring) == 0
+    assert wait_until(lambda: spk.barge_ins == 1)
+    time.sleep(0.05)
+    assert stream.discards == 1
+    stats = spk.stats()
+    assert stats["barge_ins"] == 1
+    assert stats["buffered_ms"] == 0
+    assert 50 <= stats["barge_in_last_ms"] == stats["barge_in_max_ms"] == stats["barge_in_mean_ms"]
+
+    # Nothing left to cut: no second discard
+    spk.stop()
+    time.sleep(0.05)
+    assert (spk.barge_ins, stream.discards) == (1, 1)
+
+
+class StopRecordingSink(MemorySink):
+    def __init__(self, sample_rate):
+        super().__init__(sample_rate)
+        self.stops = []
+
+    def stop(self, received_at=None):
+        super().stop(received_at)
+        self.stops.append((received_at, time.perf_counter()))
+
+
+def test_barge_in_is_timed_from_the_message_arrival(tmp_path):
+    write_wav(tmp_path / "caller.wav", np.zeros(16000))
+    script = {
+        "greeting_seconds": 0.1,
+        "turns": [
+            {
+                "user": "Bye.",
+                "functions": [{"name": "end_story", "arguments": {}}],
+                "after_audio": 0.05,
+                "agent_audio_seconds": 0.1,
+            },
+        ],
+    }
+    sinks = []
+
+    def speaker_factory(sample_rate):
+        sinks.append(StopRecordingSink(sample_rate))
+        return sinks[-1]
+
+    async def main():
+        server = await MockAgentServer(script, speed=10).serve("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        started = time.perf_counter()
+        await start_stream(
+            WavSource(str(tmp_path / "caller.wav"), speed=10, loop=True),
+            f"ws://127.0.0.1:{port}",
+            {},
+            vad={"enabled": False},
+            speaker_factory=speaker_factory,
+        )
+        server.close()
+        await server.wait_closed()
+        return started
+
+    started = asyncio.run(main())
+    stops = sinks[0].stops
+    assert stops
+    assert all(started < received_at <= stopped for received_at, stopped in stops)
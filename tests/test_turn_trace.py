@@ -0,0 +1,53 @@
+import json
+
+from turn_trace import TurnTracer, percentile
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_percentile_nearest_rank():
+    assert percentile([], 50) is None
+    assert percentile([5, 1, 3], 50) == 3
+    assert percentile(list(range(1, 101)), 90) == 90
+    assert percentile(list(range(1, 101)), 99) == 99
+
+
+def test_turn_metrics_written_as_jsonl(tmp_path):
+    clock = Clock()
+    path = tmp_path / "trace.jsonl"
+    tracer = TurnTracer(path, clock=clock)
+
+    tracer.start_turn()
+    tracer.mark("user_started_speaking")
+    clock.now = 1.0
+    tracer.mark("conversation_text", role="user")
+    tracer.mark("function_call_request", ids=["a"])
+    clock.now = 1.1
+    tracer.mark("function_start", id="a")
+    clock.now = 1.15
+    tracer.mark("function_end", id="a")
+    tracer.mark("function_response_sent", id="a")
+    clock.now = 1.6
+    tracer.agent_audio()
+    clock.now = 1.7
+    tracer.agent_audio()
+    clock.now = 3.0
+    tracer.mark("agent_audio_done")
+    metrics = tracer.end_turn()
+    tracer.close()
+
+    assert metrics["time_to_first_audio_ms"] == 600.0
+    assert metrics["function_latency_ms"] == [50.0]
+    assert metrics["function_round_trip_ms"] == [150.0]
+    assert metrics["agent_audio_ms"] == 1400.0
+
+    turn, summary = [json.loads(line) for line in path.read_text().splitlines()]
+    assert turn["type"] == "turn"
+    assert [e["event"] for e in turn["events"]].count("agent_audio_first_byte") == 1
+    assert summary["time_to_first_audio_ms"]["p50"] == 600.0
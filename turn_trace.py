@@ -0,0 +1,164 @@
+import json
+import math
+import time
+from collections import deque
+
+# Derived per-turn metrics that are summarized as percentiles
+SUMMARY_METRICS = (
+    "time_to_first_audio_ms",
+    "function_latency_ms",
+    "function_round_trip_ms",
+)
+
+
+def percentile(values, p):
+    # Nearest-rank percentile of an unsorted list
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+class TurnTracer:
+    # Records a timestamped timeline per conversational turn. A turn starts
+    # at UserStartedSpeaking (the greeting is turn 0) and ends at
+    # AgentAudioDone, at which point its events and derived latencies are
+    # appended to the JSONL trace file as one line.
+    def __init__(self, path=None, clock=time.perf_counter, history=1000):
+        self.path = path
+        self._clock = clock
+        self._file = open(path, "a", buffering=1) if path else None
+        self._metrics = {name: deque(maxlen=history) for name in SUMMARY_METRICS}
+        self.turn = 0
+        self._start = clock()
+        self._started_at = time.time()
+        self._events = []
+        self._seen_audio = False
+
+    def close(self):
+        if self._events:
+            self.end_turn()
+        if self._file:
+            self._file.write(json.dumps({"type": "summary", **self.summary()}) + "\n")
+            self._file.close()
+            self._file = None
+
+    def mark(self, event, **fields):
+        self._events.append({"event": event, "t_ms": self._elapsed_ms(), **fields})
+        if event == "conversation_text" and fields.get("role") == "user":
+            # Audio still streaming from before the caller finished talking
+            # doesn't count as the reply's first byte
+            self._seen_audio = False
+
+    def start_turn(self):
+        if self._events:
+            self.end_turn()
+        self._start = self._clock()
+        self._started_at = time.time()
+
+    def agent_audio(self):
+        # Only the first audio byte of a turn is interesting
+        if not self._seen_audio:
+            self._seen_audio = True
+            self.mark("agent_audio_first_byte")
+
+    def end_turn(self):
+        metrics = self._derive(self._events)
+        for name in SUMMARY_METRICS:
+            values = metrics.get(name)
+            if values is None:
+                continue
+            self._metrics[name].extend(values if isinstance(values, list) else [values])
+        if self._file:
+            record = {
+                "type": "turn",
+                "turn": self.turn,
+                "started_at": self._started_at,
+                "events": self._events,
+                "metrics": metrics,
+            }
+            self._file.write(json.dumps(record) + "\n")
+        self.turn += 1
+        self._events = []
+        self._seen_audio = False
+        self._start = self._clock()
+        self._started_at = time.time()
+        return metrics
+
+    def summary(self):
+        summary = {"turns": self.turn}
+        for name, values in self._metrics.items():
+            values = list(values)
+            summary[name] = {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p90": percentile(values, 90),
+                "p99": percentile(values, 99),
+            }
+        return summary
+
+    def _elapsed_ms(self):
+        return round((self._clock() - self._start) * 1000, 2)
+
+    @staticmethod
+    def _derive(events):
+        def first(name, **match):
+            for event in events:
+                if event["event"] == name and all(event.get(k) == v for k, v in match.items()):
+                    return event["t_ms"]
+            return None
+
+        def last(name, **match):
+            found = None
+            for event in events:
+                if event["event"] == name and all(event.get(k) == v for k, v in match.items()):
+                    found = event["t_ms"]
+            return found
+
+        metrics = {}
+        # The user's transcript arrives at end of utterance, which is the
+        # closest thing to "the caller stopped talking" that we observe
+        reference = last("conversation_text", role="user")
+        if reference is None:
+            reference = first("user_started_speaking")
+        first_audio = next(
+            (
+                e["t_ms"]
+                for e in events
+                if e["event"] == "agent_audio_first_byte"
+                and (reference is None or e["t_ms"] >= reference)
+            ),
+            None,
+        )
+        if first_audio is not None and reference is not None:
+            metrics["time_to_first_audio_ms"] = round(first_audio - reference, 2)
+        done = first("agent_audio_done")
+        if first_audio is not None and done is not None:
+            metrics["agent_audio_ms"] = round(done - first_audio, 2)
+
+        latencies = []
+        round_trips = []
+        for event in events:
+            if event["event"] != "function_end":
+                continue
+            fid = event.get("id")
+            start = first("function_start", id=fid)
+            sent = first("function_response_sent", id=fid)
+            request = next(
+                (
+                    e["t_ms"]
+                    for e in events
+                    if e["event"] == "function_call_request" and fid in e.get("ids", ())
+                ),
+                None,
+            )
+            if start is not None:
+                latencies.append(round(event["t_ms"] - start, 2))
+            if request is not None and sent is not None:
+                round_trips.append(round(sent - request, 2))
+        if latencies:
+            metrics["function_latency_ms"] = latencies
+        if round_trips:
+            metrics["function_round_trip_ms"] = round_trips
+        return metrics